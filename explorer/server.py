@@ -4,15 +4,16 @@ from SimpleWebSocketServer import WebSocket
 from http.server import SimpleHTTPRequestHandler
 from socketserver import TCPServer
 from threading import Thread
+from collections import OrderedDict
 import numpy as np
 import webbrowser
 import traceback
+import functools
+import heapq
 import posixpath
 import argparse
 import urllib
-import math
 import json
-import copy
 import time
 import sys
 import os
@@ -21,6 +22,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 import pytvg
 
 clients = []
+preload_task = None
+default_context_message = None
 default_context = {
 # is setup in the config file
 #    'nodeTypes': {
@@ -49,6 +52,124 @@ class ComplexEncoder(json.JSONEncoder):
         # Let the base class default method raise the TypeError
         return json.JSONEncoder.default(self, obj)
 
+def encode_message(**kwargs):
+    return json.dumps(kwargs, separators=(',', ':'), cls=ComplexEncoder)
+
+def gather_values(values, indices):
+    """
+    Look up the values of the nodes given by `indices`. Returns an array of
+    values (0.0 for missing nodes) and a mask indicating which nodes are present.
+    """
+
+    if isinstance(values, pytvg.Vector):
+        keys, weights = values.entries()
+        if len(keys) == 0:
+            return np.zeros(len(indices)), np.zeros(len(indices), dtype=bool)
+
+        order = np.argsort(keys)
+        pos = np.searchsorted(keys, indices, sorter=order)
+        pos = order[np.minimum(pos, len(keys) - 1)]
+        present = (keys[pos] == indices)
+        return np.where(present, weights[pos].astype(np.float64), 0.0), present
+
+    indices = indices.tolist()
+    present = np.fromiter((i in values for i in indices), dtype=bool, count=len(indices))
+    values = np.fromiter((values.get(i, 0.0) for i in indices), dtype=np.float64, count=len(indices))
+    return values, present
+
+# Edge weight handlers. Each handler is called with a caching query function,
+# the current window and the sample width, and returns the sparse subgraph to
+# display together with a dictionary of custom edge colors.
+
+def edges_sparse_subgraph(method):
+    def handler(query, ts_min, ts_max, sample_width):
+        graph = query(method)
+        return graph.sparse_subgraph(), {}
+    return handler
+
+def edges_stable_edges(query, ts_min, ts_max, sample_width):
+    graphs = query('sample_graphs', sample_width=sample_width)
+    graphs = [g.normalize() for g in graphs]
+    graph = pytvg.metric_stability_pareto(graphs, base=0.5)
+    return graph.sparse_subgraph(), {}
+
+def edges_stable_topics(query, ts_min, ts_max, sample_width):
+    edge_colors = {}
+    graphs = query('sample_graphs', sample_width=sample_width)
+    graphs = [g.normalize() for g in graphs]
+    stddev = pytvg.metric_std(graphs)
+    topics = query('topics')
+    graph = pytvg.metric_pareto([topics, stddev], maximize=[True, False], base=0.5)
+    seeds, _ = graph.top_edges(8, ret_weights=False)
+    subgraph = topics.sparse_subgraph(seeds=seeds)
+    for i, j in seeds.tolist():
+        edge_colors[i, j] = "red"
+        edge_colors[j, i] = "red"
+    return subgraph, edge_colors
+
+EDGE_HANDLERS = {
+    'sum_edges':        edges_sparse_subgraph('sum_edges'),
+    'count_edges':      edges_sparse_subgraph('count_edges'),
+    'topics':           edges_sparse_subgraph('topics'),
+    'sum_edges_norm':   edges_sparse_subgraph('sum_edges_norm'),
+    'count_edges_norm': edges_sparse_subgraph('count_edges_norm'),
+    'topics_norm':      edges_sparse_subgraph('topics_norm'),
+    'stable_edges':     edges_stable_edges,
+    'stable_topics':    edges_stable_topics,
+}
+
+# Node size handlers. Each handler is called with a caching query function,
+# the current window and the sample width, and returns the node values, whether
+# the values should be converted to logarithmic scale, and a dictionary of
+# custom node colors.
+
+def nodes_graph_method(method):
+    def handler(query, ts_min, ts_max, sample_width):
+        graph = query('sum_edges')
+        return getattr(graph, method)(), True, {}
+    return handler
+
+def nodes_eigenvector(query, ts_min, ts_max, sample_width):
+    graph = query('sum_edges')
+    values, _ = graph.power_iteration(tolerance=1e-3, ret_eigenvalue=False)
+    return values, True, {}
+
+def nodes_stable_nodes(query, ts_min, ts_max, sample_width):
+    values = query('sample_eigenvectors', sample_width=sample_width, tolerance=1e-3)
+    indices, weights = pytvg.metric_stability_pareto(values).entries()
+    values = dict(zip(indices.tolist(), (-weights).tolist()))
+    return values, False, {}
+
+def nodes_metric(metric):
+    def handler(query, ts_min, ts_max, sample_width):
+        values = query('sample_eigenvectors', sample_width=sample_width, tolerance=1e-3)
+        return metric(values), False, {}
+    return handler
+
+def nodes_trend(query, ts_min, ts_max, sample_width):
+    values = query('sample_eigenvectors', sample_width=sample_width, tolerance=1e-3)
+    values = pytvg.metric_trend(values)
+    indices = list(values.keys())
+    weights = np.fromiter(values.values(), dtype=np.float64, count=len(values))
+    node_colors = dict(zip(indices, np.where(weights >= 0.0, 'green', 'red').tolist()))
+    values = dict(zip(indices, np.abs(weights).tolist()))
+    return values, False, node_colors
+
+NODE_HANDLERS = {
+    'in_degrees':       nodes_graph_method('in_degrees'),
+    'in_weights':       nodes_graph_method('in_weights'),
+    'out_degrees':      nodes_graph_method('out_degrees'),
+    'out_weights':      nodes_graph_method('out_weights'),
+    'degree_anomalies': nodes_graph_method('degree_anomalies'),
+    'weight_anomalies': nodes_graph_method('weight_anomalies'),
+    'eigenvector':      nodes_eigenvector,
+    'stable_nodes':     nodes_stable_nodes,
+    'entropy':          nodes_metric(pytvg.metric_entropy),
+    'entropy_local':    nodes_metric(pytvg.metric_entropy_local),
+    'entropy_2d':       nodes_metric(pytvg.metric_entropy_2d),
+    'trend':            nodes_trend,
+}
+
 class Client(WebSocket):
     def handleConnected(self):
         try:
@@ -87,8 +208,7 @@ class Client(WebSocket):
             raise
 
     def send_message_json(self, **kwargs):
-        data = json.dumps(kwargs, indent=4, cls=ComplexEncoder)
-        self.sendMessage(data)
+        self.sendMessage(encode_message(**kwargs))
 
     def timeline_seek(self, ts_min=None, ts_max=None):
         """
@@ -106,144 +226,87 @@ class Client(WebSocket):
             print('Error: Cannot seek with partial information!')
             return
 
-        log_scale = True
-        node_colors = {}
-        edge_colors = {}
+        context = self.context
+        sample_width = (ts_max - ts_min) / 3
+
+        # Both the edge and node handlers frequently need the same
+        # aggregated graph. Remember raw and normalized query results for
+        # the current window, so that each graph is only built once, even
+        # when switching between edge weight or node size options.
+        if self.query_window != (ts_min, ts_max):
+            self.query_cache = {}
+            self.query_window = (ts_min, ts_max)
+        cache = self.query_cache
+
+        def query(method, **kwargs):
+            key = (method, ts_min, ts_max) + tuple(sorted(kwargs.items()))
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+            if method.endswith('_norm'):
+                result = query(method[:-5]).normalize()
+            elif preload_task is not None and key in preload_task.cache:
+                result = preload_task.cache[key]
+            else:
+                result = getattr(dataset_tvg, method)(ts_min, ts_max, **kwargs)
+            cache[key] = result
+            return result
 
         # Handle edge weights. Unfortunately, showing the full
         # graph is not feasible. Limit the view to a sparse
         # subgraph of about ~40 nodes.
 
-        if self.context['edgeWeight'] == 'sum_edges':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'count_edges':
-            graph = dataset_tvg.count_edges(ts_min, ts_max)
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'topics':
-            graph = dataset_tvg.topics(ts_min, ts_max)
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'sum_edges_norm':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max).normalize()
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'count_edges_norm':
-            graph = dataset_tvg.count_edges(ts_min, ts_max).normalize()
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'topics_norm':
-            graph = dataset_tvg.topics(ts_min, ts_max).normalize()
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'stable_edges':
-            graphs = dataset_tvg.sample_graphs(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3)
-            graphs = [g.normalize() for g in graphs]
-            graph = pytvg.metric_stability_pareto(graphs, base=0.5)
-            subgraph = graph.sparse_subgraph()
-
-        elif self.context['edgeWeight'] == 'stable_topics':
-            graphs = dataset_tvg.sample_graphs(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3)
-            graphs = [g.normalize() for g in graphs]
-            stddev = pytvg.metric_std(graphs)
-            topics = dataset_tvg.topics(ts_min, ts_max)
-            graph = pytvg.metric_pareto([topics, stddev], maximize=[True, False], base=0.5)
-            seeds, _ = graph.top_edges(8, ret_weights=False)
-            subgraph = topics.sparse_subgraph(seeds=seeds)
-            for i, j in seeds:
-                edge_colors[i, j] = "red"
-                edge_colors[j, i] = "red"
-
-        else:
-            print('Error: Unimplemented edge weight "%s"!' % self.context['edgeWeight'])
+        try:
+            handler = EDGE_HANDLERS[context['edgeWeight']]
+        except KeyError:
+            print('Error: Unimplemented edge weight "%s"!' % context['edgeWeight'])
             raise NotImplementedError
 
-        # Handle node weights
+        subgraph, edge_colors = handler(query, ts_min, ts_max, sample_width)
 
-        if self.context['nodeSize'] == 'in_degrees':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values = graph.in_degrees()
-
-        elif self.context['nodeSize'] == 'in_weights':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values = graph.in_weights()
-
-        elif self.context['nodeSize'] == 'out_degrees':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values = graph.out_degrees()
-
-        elif self.context['nodeSize'] == 'out_weights':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values = graph.out_weights()
-
-        elif self.context['nodeSize'] == 'degree_anomalies':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values = graph.degree_anomalies()
-
-        elif self.context['nodeSize'] == 'weight_anomalies':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values = graph.weight_anomalies()
-
-        elif self.context['nodeSize'] == 'eigenvector':
-            graph = dataset_tvg.sum_edges(ts_min, ts_max)
-            values, _ = graph.power_iteration(tolerance=1e-3, ret_eigenvalue=False)
-
-        elif self.context['nodeSize'] == 'stable_nodes':
-            values = dataset_tvg.sample_eigenvectors(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3, tolerance=1e-3)
-            values = pytvg.metric_stability_pareto(values).as_dict()
-            for i in values.keys():
-                values[i] = -values[i]
-            log_scale = False
-
-        elif self.context['nodeSize'] == 'entropy':
-            values = dataset_tvg.sample_eigenvectors(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3, tolerance=1e-3)
-            values = pytvg.metric_entropy(values)
-            log_scale = False
-
-        elif self.context['nodeSize'] == 'entropy_local':
-            values = dataset_tvg.sample_eigenvectors(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3, tolerance=1e-3)
-            values = pytvg.metric_entropy_local(values)
-            log_scale = False
-
-        elif self.context['nodeSize'] == 'entropy_2d':
-            values = dataset_tvg.sample_eigenvectors(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3, tolerance=1e-3)
-            values = pytvg.metric_entropy_2d(values)
-            log_scale = False
-
-        elif self.context['nodeSize'] == 'trend':
-            values = dataset_tvg.sample_eigenvectors(ts_min, ts_max, sample_width=(ts_max - ts_min) / 3, tolerance=1e-3)
-            values = pytvg.metric_trend(values)
-            for i in values.keys():
-                node_colors[i] = 'green' if values[i] >= 0.0 else 'red'
-                values[i] = abs(values[i])
-            log_scale = False
+        # Handle node weights
 
-        else:
-            print('Error: Unimplemented node size "%s"!' % self.context['nodeSize'])
+        try:
+            handler = NODE_HANDLERS[context['nodeSize']]
+        except KeyError:
+            print('Error: Unimplemented node size "%s"!' % context['nodeSize'])
             raise NotImplementedError
 
-        # convert values to dictionary
-        if isinstance(values, pytvg.Vector):
-            values = values.as_dict()
+        values, log_scale, node_colors = handler(query, ts_min, ts_max, sample_width)
+
+        # Gather the values of all displayed nodes in one pass.
+        indices, _ = subgraph.nodes().entries(ret_weights=False)
+        values, present = gather_values(values, indices)
 
         # convert values to logarithmic scale
         if log_scale:
-            for i in values.keys():
-                values[i] = max(math.log(values[i]) + 10.0, 1.0) if values[i] > 0.0 else 1.0
+            positive = values > 0.0
+            values = np.log(values, out=np.zeros_like(values), where=positive) + 10.0
+            values = np.where(positive, np.maximum(values, 1.0), np.where(present, 1.0, 0.0))
 
-        nodes = []
-        for i in subgraph.nodes():
-            value = values.get(i, 0.0)
+        node_types = context['nodeTypes']
+        default_color = context['defaultColor']
+        label_keys = ('label', 'norm', 'text', 'entity_name')
+        node_attributes = self.node_attributes
 
+        # Convert indices and values to native Python types in bulk, so
+        # that the JSON encoder never has to fall back to ComplexEncoder.
+        nodes = []
+        for i, value in zip(indices.tolist(), values.tolist()):
+            # Node attributes are static, remember them for subsequent seeks.
             try:
-                node = dataset_tvg.node_by_index(i)
+                node = node_attributes[i]
             except KeyError:
-                node = {}
+                try:
+                    node = dataset_tvg.node_by_index(i).as_dict()
+                except KeyError:
+                    node = {}
+                else:
+                    node_attributes[i] = node
 
             label = "Node %d" % i
-            for key in ['label', 'norm', 'text', 'entity_name']:
+            for key in label_keys:
                 try:
                     label = node[key]
                 except KeyError:
@@ -253,10 +316,15 @@ class Client(WebSocket):
 
             try:
                 ne = node['NE']
-                color = self.context['nodeTypes'][ne]['color']
             except KeyError:
                 ne = None
-                color = self.context['defaultColor']
+
+            node_type = node_types.get(ne)
+            if node_type is not None:
+                color = node_type['color']
+            else:
+                ne = None
+                color = default_color
 
             attrs = {
                 'id':    i,
@@ -275,22 +343,19 @@ class Client(WebSocket):
 
             nodes.append(attrs)
 
-        edges = []
-        for (i, j), w in zip(*subgraph.edges()):
-            attrs = {
-                'id': "%d-%d" % (i, j),
-                'from': i,
-                'to': j,
-                'value': w
-            }
+        indices, weights = subgraph.edges()
 
-            if (i, j) in edge_colors:
-                attrs['color'] = {
-                    'color': edge_colors[i, j],
-                    'inherit': False
-                }
+        edges = [{'id': "%d-%d" % (i, j), 'from': i, 'to': j, 'value': w}
+                 for (i, j), w in zip(indices.tolist(), weights.tolist())]
 
-            edges.append(attrs)
+        if edge_colors:
+            for attrs in edges:
+                key = (attrs['from'], attrs['to'])
+                if key in edge_colors:
+                    attrs['color'] = {
+                        'color': edge_colors[key],
+                        'inherit': False
+                    }
 
         self.send_message_json(cmd='network_set', nodes=nodes, edges=edges)
         self.ts_min = ts_min
@@ -298,7 +363,13 @@ class Client(WebSocket):
 
     def event_connected(self):
         print(self.address, 'connected')
-        self.context = copy.deepcopy(default_context)
+        # Only the node types can be modified per client (see save_custom_color),
+        # all other entries are immutable strings.
+        self.context = dict(default_context)
+        self.context['nodeTypes'] = {k: dict(v) for k, v in default_context['nodeTypes'].items()}
+        self.node_attributes = {}
+        self.query_cache = {}
+        self.query_window = None
         self.ts_min = None
         self.ts_max = None
 
@@ -307,7 +378,9 @@ class Client(WebSocket):
         self.data_ts_max = dataset_tvg.lookup_le().ts
         self.send_message_json(cmd='timeline_set_options', min=self.data_ts_min, max=self.data_ts_max)
 
-        self.send_message_json(cmd='set_context', context=self.context)
+        # The context of a new client always matches default_context,
+        # use the message pre-encoded at startup.
+        self.sendMessage(default_context_message)
 
     def event_message(self, data):
         msg = json.loads(data)
@@ -344,14 +417,15 @@ class Client(WebSocket):
         pass
 
 class PreloadTask(object):
-    def __init__(self, tvg, step=86400000):
+    def __init__(self, tvg, step=86400000, max_cached=1024):
         self.tvg    = tvg                # dataset to preload
         self.time   = time.time() + 1.0  # next time to run
         self.ts_min = tvg.lookup_ge().ts # minimum timestamp
         self.ts_max = None               # maximum timestamp
         self.ts     = self.ts_min        # current timestamp
         self.step   = step               # step size
-        self.refs   = []                 # references to preloaded results
+        self.cache  = OrderedDict()      # preloaded results
+        self.max_cached = max_cached     # maximum number of preloaded results
 
     def run(self):
         if time.time() < self.time:
@@ -369,9 +443,10 @@ class PreloadTask(object):
               (self.ts - self.ts_min) * 100.0 / (self.ts_max - self.ts_min)))
 
         args = (self.ts, self.ts + self.step - 1)
-        self.refs.append(self.tvg.sum_edges(*args))
-        self.refs.append(self.tvg.count_edges(*args))
-        self.refs.append(self.tvg.count_nodes(*args))
+        for method in ['sum_edges', 'count_edges', 'count_nodes']:
+            self.cache[(method,) + args] = getattr(self.tvg, method)(*args)
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
 
         self.time = time.time() + 0.5
         self.ts += self.step
@@ -386,16 +461,23 @@ class UpdateTask(object):
             return
 
         ts_max = dataset_tvg.lookup_le().ts
+        data = None
         for client in clients:
             if ts_max > client.data_ts_max:
-                client.send_message_json(cmd='update_timeline', max=ts_max)
+                # Encode the message only once for all clients.
+                if data is None:
+                    data = encode_message(cmd='update_timeline', max=ts_max)
+                client.sendMessage(data)
                 client.data_ts_max = ts_max
+                client.query_cache = {}
+                client.query_window = None
 
         self.time = time.time() + 10.0
 
 class WebHandler(SimpleHTTPRequestHandler):
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html")
+
     def __init__(self, *args, **kwargs):
-        self.directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html")
         # Python < 3.7 doesn't support the 'directory' argument yet. In this case,
         # patch the translate_path() function to workaround this issue.
         try:
@@ -404,7 +486,9 @@ class WebHandler(SimpleHTTPRequestHandler):
             self.translate_path = self._translate_path
             super().__init__(*args, **kwargs)
 
-    def _translate_path(self, path):
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _translate_path(path):
         """Translate a /-separated PATH to the local filename syntax."""
         # abandon query parameters
         path = path.split('?',1)[0]
@@ -418,7 +502,7 @@ class WebHandler(SimpleHTTPRequestHandler):
         path = posixpath.normpath(path)
         words = path.split('/')
         words = filter(None, words)
-        path = self.directory
+        path = WebHandler.directory
         for word in words:
             if os.path.dirname(word) or word in (os.curdir, os.pardir):
                 # Ignore components that are not a simple file/directory name
@@ -459,6 +543,7 @@ if __name__ == "__main__":
     default_context['defaultColor'] = config.get('defaultColor', '#bf8080')
     default_context['edgeWeight'] = config.get('edgeWeight', 'topics')
     default_context['nodeSize'] = config.get('nodeSize', 'eigenvector')
+    default_context_message = encode_message(cmd='set_context', context=default_context)
 
     if 'uri' in source:
         if 'database' not in source:
@@ -512,13 +597,25 @@ if __name__ == "__main__":
 
         tasks = []
         if args.preload:
-            tasks.append(PreloadTask(dataset_tvg))
+            preload_task = PreloadTask(dataset_tvg)
+            tasks.append(preload_task)
         tasks.append(UpdateTask(dataset_tvg))
 
+        # Keep tasks in a heap ordered by the time of their next run.
+        # The index breaks ties, since tasks themselves are not comparable.
+        tasks = [(task.time, i, task) for i, task in enumerate(tasks)]
+        heapq.heapify(tasks)
+
         while True:
+            # Block in select() until a socket becomes ready or
+            # the next task is due, instead of polling every 100 ms.
+            timeout = tasks[0][0] - time.time()
+            server.selectInterval = max(timeout, 0.0)
             server.serveonce()
-            for task in tasks:
+            while tasks[0][0] <= time.time():
+                _, i, task = heapq.heappop(tasks)
                 task.run()
+                heapq.heappush(tasks, (task.time, i, task))
 
     finally:
         webserver.shutdown()
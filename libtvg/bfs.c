@@ -94,6 +94,43 @@ done:
     return ret;
 }
 
+struct bfs_collect_context
+{
+    uint64_t max_count;
+    double max_weight;
+    struct bfs_entry *entries;
+    uint64_t max_entries;
+    uint64_t num_entries;
+};
+
+static int _bfs_collect_callback(struct graph *graph, const struct bfs_entry *entry, void *userdata)
+{
+    struct bfs_collect_context *context = userdata;
+    if (entry->count > context->max_count) return 1;
+    if (entry->weight > context->max_weight) return 1;
+    if (context->num_entries < context->max_entries)
+        context->entries[context->num_entries] = *entry;
+    context->num_entries++;
+    return 0;
+}
+
+uint64_t graph_bfs_collect(struct graph *graph, uint64_t source, int use_weights, uint64_t max_count,
+                           double max_weight, struct bfs_entry *entries, uint64_t max_entries)
+{
+    struct bfs_collect_context context;
+
+    context.max_count   = max_count;
+    context.max_weight  = max_weight;
+    context.entries     = entries;
+    context.max_entries = entries ? max_entries : 0;
+    context.num_entries = 0;
+
+    if (!graph_bfs(graph, source, use_weights, _bfs_collect_callback, &context))
+        return ~0ULL;
+
+    return context.num_entries;
+}
+
 struct bfs_distance_context
 {
     uint64_t end;
@@ -606,7 +606,9 @@ uint64_t graph_get_edges(struct graph *graph, uint64_t *indices, float *weights,
 
     GRAPH_FOR_EACH_EDGE(graph, edge)
     {
-        if (count++ >= max_edges) continue;
+        /* Once the buffer is full, counting the buckets is cheaper
+         * than iterating over the remaining edges. */
+        if (count++ >= max_edges) return graph_num_edges(graph);
         if (indices)
         {
             *indices++ = edge->source;
@@ -621,8 +623,41 @@ uint64_t graph_get_edges(struct graph *graph, uint64_t *indices, float *weights,
     return count;
 }
 
+uint64_t graph_get_edges_linear(struct graph *graph, uint64_t *keys, float *weights, uint64_t max_edges)
+{
+    uint64_t count = 0;
+    struct entry2 *edge;
+
+    if (!max_edges || (!keys && !weights))
+        return graph_num_edges(graph);
+
+    /* Same as graph_get_edges, but (source, target) is packed into a
+     * single key. Only possible when both indices fit into 32 bits.
+     * The range is only checked for edges written to the buffer, so
+     * callers have to pass max_edges >= graph_num_edges(graph) to
+     * validate all edges. */
+
+    GRAPH_FOR_EACH_EDGE(graph, edge)
+    {
+        if (count++ >= max_edges) return graph_num_edges(graph);
+        if ((edge->source | edge->target) >> 32)
+            return ~0ULL;
+        if (keys)
+        {
+            *keys++ = (edge->source << 32) | edge->target;
+        }
+        if (weights)
+        {
+            *weights++ = edge->weight;
+        }
+    }
+
+    return count;
+}
+
 struct vector *graph_get_nodes(struct graph *graph)
 {
+    uint64_t target = 0, count = 0;
     struct vector *nodes;
     struct entry2 *edge;
 
@@ -647,11 +682,28 @@ struct vector *graph_get_nodes(struct graph *graph)
             free_vector(nodes);
             return NULL;
         }
-        if (!vector_add_entry(nodes, edge->target, 1))
+
+        /* Edges within a bucket are sorted by target, so consecutive
+         * edges frequently share the same target node. Accumulate them
+         * to avoid a vector lookup for each of them. */
+        if (count && edge->target != target)
         {
-            free_vector(nodes);
-            return NULL;
+            if (!vector_add_entry(nodes, target, count))
+            {
+                free_vector(nodes);
+                return NULL;
+            }
+            count = 0;
         }
+
+        target = edge->target;
+        count++;
+    }
+
+    if (count && !vector_add_entry(nodes, target, count))
+    {
+        free_vector(nodes);
+        return NULL;
     }
 
     nodes->flags |= TVG_FLAGS_READONLY;  /* block changes */
@@ -967,6 +1019,46 @@ struct vector *graph_out_weights(const struct graph *graph)
     return vector;
 }
 
+int graph_degrees_weights(const struct graph *graph, struct vector **in_degrees, struct vector **in_weights,
+                          struct vector **out_degrees, struct vector **out_weights)
+{
+    struct vector **out[4] = { in_degrees, in_weights, out_degrees, out_weights };
+    struct vector *vectors[4] = { NULL, NULL, NULL, NULL };
+    struct entry2 *edge;
+    int i;
+
+    for (i = 0; i < 4; i++)
+    {
+        /* FIXME: Appropriate flags? */
+        if (out[i] && !(vectors[i] = alloc_vector(0)))
+            goto error;
+    }
+
+    GRAPH_FOR_EACH_DIRECTED_EDGE(graph, edge)
+    {
+        if (vectors[0] && !vector_add_entry(vectors[0], edge->target, 1.0))
+            goto error;
+        if (vectors[1] && !vector_add_entry(vectors[1], edge->target, edge->weight))
+            goto error;
+        if (vectors[2] && !vector_add_entry(vectors[2], edge->source, 1.0))
+            goto error;
+        if (vectors[3] && !vector_add_entry(vectors[3], edge->source, edge->weight))
+            goto error;
+    }
+
+    for (i = 0; i < 4; i++)
+    {
+        if (out[i]) *out[i] = vectors[i];
+    }
+
+    return 1;
+
+error:
+    for (i = 0; i < 4; i++)
+        free_vector(vectors[i]);
+    return 0;
+}
+
 struct vector *graph_degree_anomalies(const struct graph *graph)
 {
     struct vector *vector, *temp;
@@ -1152,16 +1244,14 @@ struct graph *graph_normalize(const struct graph *graph)
     float weight;
     int ret = 0;
 
-    if (!(out_weights = graph_out_weights(graph)))
-        return NULL;
-
     if (!(graph->flags & TVG_FLAGS_DIRECTED))
-        in_weights = grab_vector(out_weights);
-    else if (!(in_weights = graph_in_weights(graph)))
     {
-        free_vector(out_weights);
-        return NULL;
+        if (!(out_weights = graph_out_weights(graph)))
+            return NULL;
+        in_weights = grab_vector(out_weights);
     }
+    else if (!graph_degrees_weights(graph, NULL, &in_weights, NULL, &out_weights))
+        return NULL;
 
     graph_flags = graph->flags & TVG_FLAGS_DIRECTED;
     if (!(result = alloc_graph(graph_flags)))
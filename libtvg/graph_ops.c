@@ -161,6 +161,76 @@ int graph_del_edge(struct graph *graph, uint64_t source, uint64_t target)
     return 1;
 }
 
+int graph_apply_delta(struct graph *graph, uint64_t *indices, float *weights, uint64_t num_edges, float eps)
+{
+    struct bucket2 *bucket;
+    struct entry2 *edge;
+    uint64_t source, target;
+    uint64_t old_entries;
+    float weight, old_weight;
+    int drop;
+
+    if (UNLIKELY(graph->flags & TVG_FLAGS_READONLY))
+        return 0;
+
+    eps = fabs(eps);  /* ensure eps is positive */
+    while (num_edges--)
+    {
+        source = indices[0];
+        target = indices[1];
+        weight = weights ? *weights++ : 1.0f;
+        indices += 2;
+
+        bucket = _graph_get_bucket(graph, source, target);
+        old_entries = bucket->num_entries;
+        if (!(edge = bucket2_get_entry(bucket, source, target, 1)))
+        {
+            graph->revision++;
+            return 0;
+        }
+
+        old_weight = edge->weight;
+        weight += old_weight;
+        if (graph->flags & TVG_FLAGS_POSITIVE)
+            drop = (weight <= eps);
+        else
+            drop = (fabs(weight) <= eps);
+
+        if (drop)
+        {
+            bucket2_del_entry(bucket, edge);
+            if (!(graph->flags & TVG_FLAGS_DIRECTED) && source != target)
+                _graph_del_edge(graph, target, source);
+        }
+        else
+        {
+            edge->weight = weight;
+            if (!(graph->flags & TVG_FLAGS_DIRECTED) && source != target)
+            {
+                if (!(edge = _graph_get_edge(graph, target, source, 1)))
+                {
+                    /* Allocation failed, restore the original state. Only
+                     * delete the edge if it was created by this call. */
+                    if (bucket->num_entries != old_entries)
+                        _graph_del_edge(graph, source, target);
+                    else if ((edge = _graph_get_edge(graph, source, target, 0)))
+                        edge->weight = old_weight;
+                    graph->revision++;
+                    return 0;
+                }
+
+                edge->weight = weight;
+            }
+        }
+
+        graph->revision++;
+        if (!--graph->optimize)
+            graph_optimize(graph);
+    }
+
+    return 1;
+}
+
 int graph_mul_const(struct graph *graph, float constant)
 {
     struct entry2 *edge;
@@ -607,6 +607,20 @@ error:
     return graph;
 }
 
+uint64_t mongodb_load_graphs(struct tvg *tvg, struct mongodb *mongodb, struct objectid *objectids,
+                             uint64_t num_objectids, uint32_t flags, struct graph **graphs)
+{
+    uint64_t i, count = 0;
+
+    for (i = 0; i < num_objectids; i++)
+    {
+        if ((graphs[i] = mongodb_load_graph(tvg, mongodb, &objectids[i], flags)))
+            count++;
+    }
+
+    return count;
+}
+
 static int bson_append_filter(bson_t *bson, const char *key, const char *value)
 {
     if (!key) return 1;  /* no filter */
@@ -1148,6 +1162,17 @@ struct graph *mongodb_load_graph(struct tvg *tvg, struct mongodb *mongodb, struc
     return NULL;
 }
 
+uint64_t mongodb_load_graphs(struct tvg *tvg, struct mongodb *mongodb, struct objectid *objectids,
+                             uint64_t num_objectids, uint32_t flags, struct graph **graphs)
+{
+    uint64_t i;
+
+    for (i = 0; i < num_objectids; i++)
+        graphs[i] = NULL;
+
+    return 0;
+}
+
 int tvg_load_graphs_from_mongodb(struct tvg *tvg, struct mongodb *mongodb)
 {
     return 0;
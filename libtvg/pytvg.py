@@ -9,6 +9,7 @@ from ctypes import Structure
 from ctypes import POINTER
 from ctypes import CFUNCTYPE
 from ctypes import addressof
+from ctypes import sizeof
 from ctypes.util import find_library
 import collections
 import functools
@@ -29,7 +30,7 @@ filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), libname)
 lib = cdll.LoadLibrary(filename)
 libc = cdll.LoadLibrary(find_library('c'))
 
-LIBTVG_API_VERSION  = 0x00000009
+LIBTVG_API_VERSION  = 0x0000000F
 
 TVG_FLAGS_POSITIVE  = 0x00000002
 TVG_FLAGS_DIRECTED  = 0x00000004
@@ -51,7 +52,8 @@ class c_objectid(Structure):
 class c_vector(Structure):
     _fields_ = [("refcount", c_uint64),
                 ("flags",    c_uint),
-                ("revision", c_uint64)]
+                ("revision", c_uint64),
+                ("num_entries", c_uint64)]
 
 class c_graph(Structure):
     _fields_ = [("refcount", c_uint64),
@@ -100,6 +102,19 @@ class c_snapshot_entry(Structure):
     _fields_ = [("ts_min",   c_uint64),
                 ("ts_max",   c_uint64)]
 
+# Offsets of header fields, used to read them directly from the object address
+# instead of constructing a Structure proxy via `.contents`. All objects start
+# with the refcount.
+_REFCOUNT_OFFSET        = 0
+_VECTOR_FLAGS_OFFSET    = c_vector.flags.offset
+_VECTOR_NUM_ENTRIES_OFFSET = c_vector.num_entries.offset
+_GRAPH_FLAGS_OFFSET     = c_graph.flags.offset
+_GRAPH_TS_OFFSET        = c_graph.ts.offset
+_GRAPH_OBJECTID_OFFSET  = c_graph.objectid.offset
+_NODE_INDEX_OFFSET      = c_node.index.offset
+_TVG_FLAGS_OFFSET       = c_tvg.flags.offset
+_TVG_VERBOSITY_OFFSET   = c_tvg.verbosity.offset
+
 # Hacky: we need optional ndpointer parameters at some places.
 def or_null(klass):
     class wrapper:
@@ -131,6 +146,21 @@ c_bfs_entry_p    = POINTER(c_bfs_entry)
 c_bfs_callback_p = CFUNCTYPE(c_int, c_graph_p, c_bfs_entry_p, c_void_p)
 c_snapshot_callback_p = CFUNCTYPE(c_int, c_uint64, c_snapshot_entry_p, c_void_p)
 
+# Preconstructed dtypes, so that allocations do not have to resolve them each time.
+_dtype_uint64    = np.dtype(np.uint64)
+_dtype_float32   = np.dtype(np.float32)
+_dtype_bfs_entry = np.dtype([("weight",    np.float64),
+                             ("count",     np.uint64),
+                             ("edge_from", np.uint64),
+                             ("edge_to",   np.uint64)])
+assert _dtype_bfs_entry.itemsize == sizeof(c_bfs_entry)
+
+c_uint64_array   = npc.ndpointer(dtype=_dtype_uint64,  flags='C_CONTIGUOUS')
+c_float_array    = npc.ndpointer(dtype=_dtype_float32, flags='C_CONTIGUOUS')
+c_bfs_entry_array = npc.ndpointer(dtype=_dtype_bfs_entry, flags='C_CONTIGUOUS')
+c_uint64_array_or_null = or_null(c_uint64_array)
+c_float_array_or_null  = or_null(c_float_array)
+
 # Before proceeding with any other function calls, first make sure that the library
 # is compatible. This is especially important since there is no stable API yet.
 
@@ -172,19 +202,19 @@ lib.vector_get_entry.restype = c_float
 lib.vector_num_entries.argtypes = (c_vector_p,)
 lib.vector_num_entries.restype = c_uint64
 
-lib.vector_get_entries.argtypes = (c_vector_p, or_null(npc.ndpointer(dtype=np.uint64)), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.vector_get_entries.argtypes = (c_vector_p, c_uint64_array_or_null, c_float_array_or_null, c_uint64)
 lib.vector_get_entries.restype = c_uint64
 
 lib.vector_set_entry.argtypes = (c_vector_p, c_uint64, c_float)
 lib.vector_set_entry.restype = c_int
 
-lib.vector_set_entries.argtypes = (c_vector_p, npc.ndpointer(dtype=np.uint64), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.vector_set_entries.argtypes = (c_vector_p, c_uint64_array, c_float_array_or_null, c_uint64)
 lib.vector_set_entries.restype = c_int
 
 lib.vector_add_entry.argtypes = (c_vector_p, c_uint64, c_float)
 lib.vector_add_entry.restype = c_int
 
-lib.vector_add_entries.argtypes = (c_vector_p, npc.ndpointer(dtype=np.uint64), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.vector_add_entries.argtypes = (c_vector_p, c_uint64_array, c_float_array_or_null, c_uint64)
 lib.vector_add_entries.restype = c_int
 
 lib.vector_add_vector.argtypes = (c_vector_p, c_vector_p, c_float)
@@ -193,7 +223,7 @@ lib.vector_add_vector.restype = c_int
 lib.vector_sub_entry.argtypes = (c_vector_p, c_uint64, c_float)
 lib.vector_sub_entry.restype = c_int
 
-lib.vector_sub_entries.argtypes = (c_vector_p, npc.ndpointer(dtype=np.uint64), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.vector_sub_entries.argtypes = (c_vector_p, c_uint64_array, c_float_array_or_null, c_uint64)
 lib.vector_sub_entries.restype = c_int
 
 lib.vector_sub_vector.argtypes = (c_vector_p, c_vector_p, c_float)
@@ -202,7 +232,7 @@ lib.vector_sub_vector.restype = c_int
 lib.vector_del_entry.argtypes = (c_vector_p, c_uint64)
 lib.vector_del_entry.restype = c_int
 
-lib.vector_del_entries.argtypes = (c_vector_p, npc.ndpointer(dtype=np.uint64), c_uint64)
+lib.vector_del_entries.argtypes = (c_vector_p, c_uint64_array, c_uint64)
 lib.vector_del_entries.restype = c_int
 
 lib.vector_mul_const.argtypes = (c_vector_p, c_float)
@@ -255,6 +285,9 @@ lib.next_graph.restype = c_graph_p
 lib.graph_del_small.argtypes = (c_graph_p, c_float)
 lib.graph_del_small.restype = c_int
 
+lib.graph_apply_delta.argtypes = (c_graph_p, c_uint64_array, c_float_array_or_null, c_uint64, c_float)
+lib.graph_apply_delta.restype = c_int
+
 lib.graph_empty.argtypes = (c_graph_p,)
 lib.graph_empty.restype = c_int
 
@@ -267,28 +300,31 @@ lib.graph_get_edge.restype = c_float
 lib.graph_num_edges.argtypes = (c_graph_p,)
 lib.graph_num_edges.restype = c_uint64
 
-lib.graph_get_edges.argtypes = (c_graph_p, or_null(npc.ndpointer(dtype=np.uint64)), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.graph_get_edges.argtypes = (c_graph_p, c_uint64_array_or_null, c_float_array_or_null, c_uint64)
 lib.graph_get_edges.restype = c_uint64
 
+lib.graph_get_edges_linear.argtypes = (c_graph_p, c_uint64_array_or_null, c_float_array_or_null, c_uint64)
+lib.graph_get_edges_linear.restype = c_uint64
+
 lib.graph_get_nodes.argtypes = (c_graph_p,)
 lib.graph_get_nodes.restype = c_vector_p
 
-lib.graph_get_top_edges.argtypes = (c_graph_p, or_null(npc.ndpointer(dtype=np.uint64)), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.graph_get_top_edges.argtypes = (c_graph_p, c_uint64_array_or_null, c_float_array_or_null, c_uint64)
 lib.graph_get_top_edges.restype = c_uint64
 
-lib.graph_get_adjacent_edges.argtypes = (c_graph_p, c_uint64, or_null(npc.ndpointer(dtype=np.uint64)), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.graph_get_adjacent_edges.argtypes = (c_graph_p, c_uint64, c_uint64_array_or_null, c_float_array_or_null, c_uint64)
 lib.graph_get_adjacent_edges.restype = c_uint64
 
 lib.graph_set_edge.argtypes = (c_graph_p, c_uint64, c_uint64, c_float)
 lib.graph_set_edge.restype = c_int
 
-lib.graph_set_edges.argtypes = (c_graph_p, npc.ndpointer(dtype=np.uint64), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.graph_set_edges.argtypes = (c_graph_p, c_uint64_array, c_float_array_or_null, c_uint64)
 lib.graph_set_edges.restype = c_int
 
 lib.graph_add_edge.argtypes = (c_graph_p, c_uint64, c_uint64, c_float)
 lib.graph_add_edge.restype = c_int
 
-lib.graph_add_edges.argtypes = (c_graph_p, npc.ndpointer(dtype=np.uint64), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.graph_add_edges.argtypes = (c_graph_p, c_uint64_array, c_float_array_or_null, c_uint64)
 lib.graph_add_edges.restype = c_int
 
 lib.graph_add_graph.argtypes = (c_graph_p, c_graph_p, c_float)
@@ -297,7 +333,7 @@ lib.graph_add_graph.restype = c_int
 lib.graph_sub_edge.argtypes = (c_graph_p, c_uint64, c_uint64, c_float)
 lib.graph_sub_edge.restype = c_int
 
-lib.graph_sub_edges.argtypes = (c_graph_p, npc.ndpointer(dtype=np.uint64), or_null(npc.ndpointer(dtype=np.float32)), c_uint64)
+lib.graph_sub_edges.argtypes = (c_graph_p, c_uint64_array, c_float_array_or_null, c_uint64)
 lib.graph_sub_edges.restype = c_int
 
 lib.graph_sub_graph.argtypes = (c_graph_p, c_graph_p, c_float)
@@ -306,7 +342,7 @@ lib.graph_sub_graph.restype = c_int
 lib.graph_del_edge.argtypes = (c_graph_p, c_uint64, c_uint64)
 lib.graph_del_edge.restype = c_int
 
-lib.graph_del_edges.argtypes = (c_graph_p, npc.ndpointer(dtype=np.uint64), c_uint64)
+lib.graph_del_edges.argtypes = (c_graph_p, c_uint64_array, c_uint64)
 lib.graph_del_edges.restype = c_int
 
 lib.graph_mul_const.argtypes = (c_graph_p, c_float)
@@ -327,6 +363,9 @@ lib.graph_out_degrees.restype = c_vector_p
 lib.graph_out_weights.argtypes = (c_graph_p,)
 lib.graph_out_weights.restype = c_vector_p
 
+lib.graph_degrees_weights.argtypes = (c_graph_p, POINTER(c_vector_p), POINTER(c_vector_p), POINTER(c_vector_p), POINTER(c_vector_p))
+lib.graph_degrees_weights.restype = c_int
+
 lib.graph_degree_anomalies.argtypes = (c_graph_p,)
 lib.graph_degree_anomalies.restype = c_vector_p
 
@@ -354,6 +393,9 @@ lib.graph_load_binary.restype = c_graph_p
 lib.graph_bfs.argtypes = (c_graph_p, c_uint64, c_int, c_bfs_callback_p, c_void_p)
 lib.graph_bfs.restype = c_int
 
+lib.graph_bfs_collect.argtypes = (c_graph_p, c_uint64, c_int, c_uint64, c_double, c_bfs_entry_array, c_uint64)
+lib.graph_bfs_collect.restype = c_uint64
+
 lib.graph_get_distance_count.argtypes = (c_graph_p, c_uint64, c_uint64)
 lib.graph_get_distance_count.restype = c_uint64
 
@@ -508,6 +550,9 @@ lib.free_mongodb.restype = None
 lib.mongodb_load_graph.argtypes = (c_tvg_p, c_mongodb_p, c_objectid_p, c_uint)
 lib.mongodb_load_graph.restype = c_graph_p
 
+lib.mongodb_load_graphs.argtypes = (c_tvg_p, c_mongodb_p, c_objectid_p, c_uint64, c_uint, POINTER(c_graph_p))
+lib.mongodb_load_graphs.restype = c_uint64
+
 lib.tvg_load_graphs_from_mongodb.argtypes = (c_tvg_p, c_mongodb_p)
 lib.tvg_load_graphs_from_mongodb.restype = c_int
 
@@ -516,21 +561,40 @@ lib.tvg_load_graphs_from_mongodb.restype = c_int
 libc.free.argtypes = (c_void_p,)
 libc.free.restype = None
 
+# Single-element accessors are bound to module-level names, which saves an attribute
+# lookup on `lib` for each call. These are commonly used in tight loops.
+
+_vector_has_entry = lib.vector_has_entry
+_vector_get_entry = lib.vector_get_entry
+_vector_set_entry = lib.vector_set_entry
+_vector_add_entry = lib.vector_add_entry
+_vector_sub_entry = lib.vector_sub_entry
+_vector_del_entry = lib.vector_del_entry
+_graph_has_edge = lib.graph_has_edge
+_graph_get_edge = lib.graph_get_edge
+_graph_set_edge = lib.graph_set_edge
+_graph_add_edge = lib.graph_add_edge
+_graph_sub_edge = lib.graph_sub_edge
+_graph_del_edge = lib.graph_del_edge
+
 # The 'cacheable' decorator can be used on Vector and Graph objects to cache the result
 # of a function call as long as the underlying vector/graph has not changed. This is
 # ensured by storing and comparing the revision number embedded in the object header.
+# All library functions modifying a vector/graph increment the revision, so mutating
+# methods do not have to invalidate cached results explicitly.
+# The cached `(revision, result)` tuple is kept in the instance dictionary, so it is
+# released together with the object.
+# The revision is read through the `_revision` view set up in the constructor, which
+# avoids constructing a Structure proxy via `.contents` on each call.
 def cacheable(func):
-    cache = weakref.WeakKeyDictionary()
+    key = "_cache_%s" % func.__name__
     @functools.wraps(func)
     def wrapper(self, drop_cache=False):
-        try:
-            old_revision, result = cache[self]
-        except KeyError:
-            old_revision, result = (None, None)
-        new_revision = self._obj.contents.revision
+        old_revision, result = self.__dict__.get(key, (None, None))
+        new_revision = self._revision.value
         if old_revision != new_revision or drop_cache:
             result = func(self) # FIXME: Support *args, **kwargs.
-            cache[self] = (new_revision, result)
+            self.__dict__[key] = (new_revision, result)
         return result
     return wrapper
 
@@ -559,46 +623,224 @@ def libtvgobject(klass):
         __doc__ = klass.__doc__
         def __new__(cls, *args, obj=None, **kwargs):
             if obj:
-                try:
-                    return cache[addressof(obj.contents)]._get_obj()
-                except KeyError:
-                    pass
-            result = klass(*args, obj=obj, **kwargs)
+                addr = addressof(obj.contents)
+                result = cache.get(addr)
+                if result is not None:
+                    return result._get_obj()
+                result = klass(*args, obj=obj, **kwargs)
+            else:
+                result = klass(*args, obj=obj, **kwargs)
+                addr = addressof(result._obj.contents)
             result.__class__ = cls
-            cache[addressof(result._obj.contents)] = result
+            result._obj_addr = addr
+            cache[addr] = result
             return result
         def __init__(self, *args, **kwargs):
             pass
     return wrapper
 
+def _convert_values_matrix(values):
+    """
+    Convert values for each node or edge to a list of keys and a dense matrix,
+    where each row contains the values of the corresponding key.
+    """
+
+    if isinstance(values, dict):
+        return list(values.keys()), np.array(list(values.values()), dtype=np.float64)
+
+    # Assign a row to each node/edge, then fill a dense (rows x steps) matrix.
+    # Missing values are implicitly zero, so no per-entry padding is required.
+    rows = {}
+    columns = []
+    for v in values:
+        if isinstance(v, Vector):
+            keys, weights = v.entries()
+            keys = keys.tolist()
+        elif isinstance(v, Graph):
+            keys, weights = v.edges()
+            keys = list(map(tuple, keys.tolist()))
+        else:
+            keys = list(v.keys())
+            weights = list(v.values())
+
+        index = np.fromiter((rows.setdefault(k, len(rows)) for k in keys),
+                            dtype=np.intp, count=len(keys))
+        columns.append((index, weights))
+
+    matrix = np.zeros((len(rows), len(columns)))
+    for step, (index, weights) in enumerate(columns):
+        matrix[index, step] = weights
+
+    return list(rows.keys()), matrix
+
 def _convert_values(values):
     if isinstance(values, dict):
         return values
 
-    result = collections.defaultdict(list)
-    for step, v in enumerate(values):
-        if isinstance(v, Vector):
-            indices, weights = v.entries()
-            for i, w in zip(indices, weights):
-                result[i] += [0.0] * (step - len(result[i]))
-                result[i].append(w)
+    keys, matrix = _convert_values_matrix(values)
+    return dict(zip(keys, matrix.tolist()))
 
-        elif isinstance(v, Graph):
-            indices, weights = v.edges()
-            for i, w in zip(indices, weights):
-                i = tuple(i)
-                result[i] += [0.0] * (step - len(result[i]))
-                result[i].append(w)
+def _row_mean_std(values, ddof=0):
+    """
+    Return the mean and standard deviation of each row of `values`. The results
+    match np.mean() and np.std(), but the mean is only computed once.
+    """
 
-        else:
-            for i, w in v.items():
-                result[i] += [0.0] * (step - len(result[i]))
-                result[i].append(w)
+    count = values.shape[1]
+    avg = np.sum(values, axis=1, keepdims=True) / count
+    dev = values - avg
+    dev *= dev
+    std = np.sqrt(np.sum(dev, axis=1) / (count - ddof))
+    return avg[:, 0], std
 
-    for i in result.keys():
-        result[i] += [0.0] * (len(values) - len(result[i]))
+def _bin_indices(data, num_bins):
+    """
+    Split the range of `data` into `num_bins` bins of equal width, and assign
+    each value to a bin. Returns `(hist_index, lookup_index)`, where the first
+    follows the convention of np.histogram (half-open bins, last bin closed)
+    and the second assigns values on an inner bin edge to the lower bin.
+    """
 
-    return result
+    bin_edges = np.histogram_bin_edges(data, bins=num_bins)
+    index = np.searchsorted(bin_edges, data, side='right') - 1
+    np.minimum(index, num_bins - 1, out=index)
+    on_edge = (data == bin_edges[index]) & (index > 0)
+    return index, index - on_edge
+
+def _entropy(counts):
+    """ Return the entropy contribution of each bin of a histogram. """
+
+    prob = counts / np.sum(counts)
+    entropy = np.zeros(prob.shape)
+    nonzero = (prob > 0.0)
+    np.log(prob, where=nonzero, out=entropy)
+    np.multiply(entropy, -prob, where=nonzero, out=entropy)
+    return entropy
+
+@functools.lru_cache(maxsize=1024)
+def _encode_key(key):
+    """
+    Return the UTF-8 encoding of the attribute name `key`. Attribute names are
+    drawn from a small vocabulary, so the encoded strings are cached.
+    """
+
+    return key.encode("utf-8")
+
+# Native layout of c_objectid, used to fill all fields with a single write.
+_objectid_struct = struct.Struct("=QII")
+assert _objectid_struct.size == sizeof(c_objectid)
+
+# Big-endian layout of a 12-byte MongoDB objectid.
+_oid_struct = struct.Struct(">IQ")
+
+def _set_objectid(objectid, id):
+    """
+    Fill the `c_objectid` structure `objectid` from a numeric identifier, a 12-byte
+    objectid or its hex representation.
+    """
+
+    if isinstance(id, (int, np.integer)):
+        _objectid_struct.pack_into(objectid, 0, int(id), 0, OBJECTID_INT)
+
+    elif isinstance(id, bytes) and len(id) == 12:
+        hi, lo = _oid_struct.unpack(id)
+        _objectid_struct.pack_into(objectid, 0, lo, hi, OBJECTID_OID)
+
+    elif isinstance(id, str) and len(id) == 24:
+        hi, lo = _oid_struct.unpack(bytes.fromhex(id))
+        _objectid_struct.pack_into(objectid, 0, lo, hi, OBJECTID_OID)
+
+    else:
+        raise ValueError("Objectid is not valid")
+
+def _as_contiguous(array, dtype):
+    """
+    Return `array` as a C-contiguous numpy array of type `dtype`. Arrays which
+    already have the expected layout are passed through without conversion.
+    Signed integer arrays are reinterpreted as unsigned without copying, this
+    gives the same result as a cast.
+    """
+
+    if isinstance(array, np.ndarray) and array.flags.c_contiguous:
+        if array.dtype == dtype:
+            return array
+        if dtype.kind == 'u' and array.dtype.kind == 'i' and array.dtype.itemsize == dtype.itemsize:
+            return array.view(dtype)
+    return np.asarray(array, dtype=dtype, order='C')
+
+def _check_buffer(array, dtype, ndim):
+    """
+    Validate a caller-provided output buffer and return its capacity.
+    """
+
+    if array is None:
+        return None
+    if not isinstance(array, np.ndarray) or array.dtype != dtype or not array.flags.c_contiguous:
+        raise ValueError("buffer must be a C-contiguous numpy array of type %s" % np.dtype(dtype).name)
+    if len(array.shape) != ndim or (ndim == 2 and array.shape[1] != 2):
+        raise ValueError("buffer does not have correct dimensions")
+    return array.shape[0]
+
+def _empty_indices_weights(count, ret_indices, ret_weights, ndim):
+    """
+    Allocate output arrays for `count` indices and/or weights. `ndim` is 1 for
+    vector indices and 2 for graph indices. When both arrays are requested, they
+    are views into a single allocation.
+    """
+
+    shape = (count, 2) if ndim == 2 else (count,)
+    if not (ret_indices and ret_weights):
+        indices = np.empty(shape, dtype=_dtype_uint64) if ret_indices else None
+        weights = np.empty(count, dtype=_dtype_float32) if ret_weights else None
+        return indices, weights
+
+    size = count * ndim * _dtype_uint64.itemsize
+    buffer = np.empty(size + count * _dtype_float32.itemsize, dtype=np.uint8)
+    indices = buffer[:size].view(_dtype_uint64).reshape(shape)
+    weights = buffer[size:].view(_dtype_float32)
+    return indices, weights
+
+def _convert_indices(indices, ndim):
+    """
+    Convert indices to a contiguous numpy array as expected by the batch functions
+    of the library. `ndim` is 1 for vector indices and 2 for graph indices consisting
+    of (source, target). Empty input is returned as an array of length zero.
+    """
+
+    if isinstance(indices, set):
+        indices = list(indices)
+
+    indices = _as_contiguous(indices, _dtype_uint64)
+    shape = indices.shape
+    if len(shape) != ndim or (ndim == 2 and shape[1] != 2):
+        if indices.size != 0:
+            raise ValueError("indices array does not have correct dimensions")
+        indices = indices.reshape((0, 2) if ndim == 2 else (0,))
+
+    return indices
+
+def _convert_indices_weights(indices, weights, ndim):
+    """
+    Convert indices (and optionally weights) to contiguous numpy arrays as expected
+    by the batch functions of the library. `ndim` is 1 for vector indices and 2 for
+    graph indices consisting of (source, target). Empty input is returned as an array
+    of length zero, so callers only have to check `indices.shape[0]`.
+    """
+
+    if weights is None and isinstance(indices, dict):
+        entries = indices
+        indices = list(entries.keys())
+        weights = list(entries.values())
+
+    indices = _convert_indices(indices, ndim)
+    if weights is not None:
+        weights = _as_contiguous(weights, _dtype_float32)
+        if weights.ndim != 1:
+            raise ValueError("weights array does not have correct dimensions")
+        if indices.shape[0] != weights.shape[0]:
+            raise ValueError("indices/weights arrays have different length")
+
+    return indices, weights
 
 def metric_entropy(values, num_bins=50):
     """
@@ -612,29 +854,15 @@ def metric_entropy(values, num_bins=50):
     Dictionary containing the metric for each node or edge.
     """
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    keys, values = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    data = []
-    for i in values.keys():
-        data += values[i]
-
-    prob, bin_edges = np.histogram(data, bins=num_bins)
-    prob = np.array(prob, dtype=float) / np.sum(prob)
-    entropy = (- np.ma.log(prob) * prob).filled(0)
-
-    @np.vectorize
-    def to_entropy(x):
-        index = np.searchsorted(bin_edges, x)
-        if index >= 1: index -= 1
-        return entropy[index]
-
-    result = {}
-    for i in values.keys():
-        result[i] = np.sum(to_entropy(values[i]))
+    hist_index, index = _bin_indices(values, num_bins)
+    entropy = _entropy(np.bincount(hist_index.ravel(), minlength=num_bins))
 
-    return result
+    result = entropy[index].sum(axis=1)
+    return dict(zip(keys, result))
 
 def metric_entropy_local(values, num_bins=50):
     """
@@ -648,32 +876,17 @@ def metric_entropy_local(values, num_bins=50):
     Dictionary containing the metric for each node or edge.
     """
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    keys, values = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    sample_steps = len(next(iter(values.values())))
-
-    result = collections.defaultdict(float)
-    for j in range(sample_steps):
-
-        data = []
-        for i in values.keys():
-            data.append(values[i][j])
-
-        prob, bin_edges = np.histogram(data, bins=num_bins)
-        prob = np.array(prob, dtype=float) / np.sum(prob)
-        entropy = (- np.ma.log(prob) * prob).filled(0)
-
-        def to_entropy(x):
-            index = np.searchsorted(bin_edges, x)
-            if index >= 1: index -= 1
-            return entropy[index]
+    result = np.zeros(len(keys))
+    for data in values.T:
+        hist_index, index = _bin_indices(data, num_bins)
+        entropy = _entropy(np.bincount(hist_index, minlength=num_bins))
+        result += entropy[index]
 
-        for i in values.keys():
-            result[i] += to_entropy(values[i][j])
-
-    return result
+    return dict(zip(keys, result))
 
 def metric_entropy_2d(values, num_bins=50):
     """
@@ -687,34 +900,27 @@ def metric_entropy_2d(values, num_bins=50):
     Dictionary containing the metric for each node or edge.
     """
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    keys, values = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    data_x = []
-    data_y = []
-    for i in values.keys():
-        data_x += values[i][:-1]
-        data_y += values[i][1:]
+    hist_index_x, index_x = _bin_indices(values[:, :-1], num_bins)
+    hist_index_y, index_y = _bin_indices(values[:, 1:], num_bins)
 
-    prob, bin_edges_x, bin_edges_y = np.histogram2d(data_x, data_y, bins=num_bins)
+    hist_index = (hist_index_x * num_bins + hist_index_y).ravel()
+    index = index_x * num_bins + index_y
 
-    prob = np.array(prob, dtype=float) / np.sum(prob)
-    entropy = (- np.ma.log(prob) * prob).filled(0)
-
-    @np.vectorize
-    def to_entropy(x, y):
-        index_x = np.searchsorted(bin_edges_x, x)
-        index_y = np.searchsorted(bin_edges_y, y)
-        if index_x >= 1: index_x -= 1
-        if index_y >= 1: index_y -= 1
-        return entropy[index_x, index_y]
-
-    result = {}
-    for i in values.keys():
-        result[i] = np.sum(to_entropy(values[i][:-1], values[i][1:]))
-
-    return result
+    if num_bins * num_bins <= hist_index.size:
+        entropy = _entropy(np.bincount(hist_index, minlength=num_bins * num_bins))
+        result = entropy[index].sum(axis=1)
+    else:
+        # Most bins of the 2-dimensional histogram are empty, so only
+        # keep track of the non-empty ones.
+        bins, counts = np.unique(hist_index, return_counts=True)
+        entropy = _entropy(counts)
+        pos = np.minimum(np.searchsorted(bins, index), len(bins) - 1)
+        result = np.where(bins[pos] == index, entropy[pos], 0.0).sum(axis=1)
+    return dict(zip(keys, result))
 
 def metric_trend(values):
     """
@@ -727,25 +933,20 @@ def metric_trend(values):
     Dictionary containing the metric for each node or edge.
     """
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    keys, values = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    sample_steps = len(next(iter(values.values())))
+    # The least-squares fit of `a + b * t` has the closed-form solution
+    # b = cov(t, y) / var(t), which can be computed for all rows at once.
+    t = np.arange(values.shape[1], dtype=np.float64)
+    t -= t.mean()
+    denom = np.dot(t, t)
+    if denom == 0.0:
+        return dict.fromkeys(keys, 0.0)
 
-    A = np.zeros((sample_steps, 2))
-    A[:, 0] = 1.0
-    A[:, 1] = range(A.shape[0])
-
-    kwargs = {}
-    if np.lib.NumpyVersion(np.__version__) >= '1.14.0':
-        kwargs['rcond'] = None
-
-    result = {}
-    for i in values.keys():
-        result[i] = np.linalg.lstsq(A, values[i], **kwargs)[0][1]
-
-    return result
+    result = np.dot(values, t) / denom
+    return dict(zip(keys, result))
 
 def metric_stability_ratio(values):
     """
@@ -758,19 +959,14 @@ def metric_stability_ratio(values):
     Dictionary containing the metric for each node or edge.
     """
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    keys, values = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    result = {}
-    for i in values.keys():
-        std = np.std(values[i])
-        if std > 0.0:
-            result[i] = np.abs(np.mean(values[i])) / std
-        else:
-            result[i] = np.inf
-
-    return result
+    avg, std = _row_mean_std(values)
+    result = np.full(len(keys), np.inf)
+    np.divide(np.abs(avg), std, out=result, where=(std > 0.0))
+    return dict(zip(keys, result.tolist()))
 
 def metric_avg(values):
     """
@@ -786,27 +982,25 @@ def metric_avg(values):
     if not isinstance(values, dict):
         # Fast-path for list of Graphs and list of Vectors.
 
-        if all([isinstance(v, Graph) for v in values]):
-            objs = (c_graph_p * len(values))()
-            for i, v in enumerate(values):
-                objs[i] = v._obj
+        if all(isinstance(v, Graph) for v in values):
+            objs = (c_graph_p * len(values))(*[v._obj for v in values])
             return Graph(obj=lib.metric_graph_avg(objs, len(values)))
 
-        if all([isinstance(v, Vector) for v in values]):
-            objs = (c_vector_p * len(values))()
-            for i, v in enumerate(values):
-                objs[i] = v._obj
+        if all(isinstance(v, Vector) for v in values):
+            objs = (c_vector_p * len(values))(*[v._obj for v in values])
             return Vector(obj=lib.metric_vector_avg(objs, len(values)))
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    if isinstance(values, dict):
+        result = {}
+        for i in values.keys():
+            result[i] = np.mean(values[i])
+        return result
+
+    keys, matrix = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    result = {}
-    for i in values.keys():
-        result[i] = np.mean(values[i])
-
-    return result
+    return dict(zip(keys, np.mean(matrix, axis=1).tolist()))
 
 def metric_std(values):
     """
@@ -822,27 +1016,53 @@ def metric_std(values):
     if not isinstance(values, dict):
         # Fast-path for list of Graphs and list of Vectors.
 
-        if all([isinstance(v, Graph) for v in values]):
-            objs = (c_graph_p * len(values))()
-            for i, v in enumerate(values):
-                objs[i] = v._obj
+        if all(isinstance(v, Graph) for v in values):
+            objs = (c_graph_p * len(values))(*[v._obj for v in values])
             return Graph(obj=lib.metric_graph_std(objs, len(values)))
 
-        if all([isinstance(v, Vector) for v in values]):
-            objs = (c_vector_p * len(values))()
-            for i, v in enumerate(values):
-                objs[i] = v._obj
+        if all(isinstance(v, Vector) for v in values):
+            objs = (c_vector_p * len(values))(*[v._obj for v in values])
             return Vector(obj=lib.metric_vector_std(objs, len(values)))
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    if isinstance(values, dict):
+        result = {}
+        for i in values.keys():
+            result[i] = np.std(values[i], ddof=1)
+        return result
+
+    keys, matrix = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    result = {}
-    for i in values.keys():
-        result[i] = np.std(values[i], ddof=1)
+    return dict(zip(keys, np.std(matrix, axis=1, ddof=1).tolist()))
 
-    return result
+def _pareto_front(costs):
+    """
+    Return a mask of all rows of `costs` that are not dominated by any other row,
+    i.e., there is no other row with smaller or equal costs in all dimensions and
+    strictly smaller costs in at least one dimension.
+    """
+
+    if costs.shape[1] != 2:
+        front = np.ones(costs.shape[0], dtype=bool)
+        for i, c in enumerate(costs):
+            if front[i]:
+                front[front] = np.any(costs[front] <  c, axis=1) | \
+                               np.all(costs[front] <= c, axis=1)
+        return front
+
+    # For two dimensions, sort by (x, y). A point is dominated if another point
+    # with the same x has a smaller y, or a point with smaller x has smaller or
+    # equal y. Within each group of equal x, the first point has the smallest y.
+    order = np.lexsort((costs[:, 1], costs[:, 0]))
+    x = costs[order, 0]
+    y = costs[order, 1]
+    start = np.searchsorted(x, x, side='left')
+    prev_min = np.concatenate(([np.inf], np.minimum.accumulate(y)))[start]
+
+    front = np.empty(costs.shape[0], dtype=bool)
+    front[order] = (y <= y[start]) & (prev_min > y)
+    return front
 
 def metric_pareto(values, maximize=True, base=0.0):
     """
@@ -863,43 +1083,37 @@ def metric_pareto(values, maximize=True, base=0.0):
     if len(maximize) != len(values):
         raise NotImplementedError("Wrong number of maximize parameters")
 
-    if len(values) == 2 and all([isinstance(v, Graph) for v in values]):
+    if len(values) == 2 and all(isinstance(v, Graph) for v in values):
         return Graph(obj=lib.metric_graph_pareto(values[0]._obj, values[1]._obj,
                                                  maximize[0], maximize[1], base))
 
-    if len(values) == 2 and all([isinstance(v, Vector) for v in values]):
+    if len(values) == 2 and all(isinstance(v, Vector) for v in values):
         return Vector(obj=lib.metric_vector_pareto(values[0]._obj, values[1]._obj,
                                                    maximize[0], maximize[1], base))
 
-    values = _convert_values(values)
-    if len(values) == 0:
+    keys, costs = _convert_values_matrix(values)
+    if len(keys) == 0:
         return {}
 
-    weights = np.array([(-1 if m else 1) for m in maximize])
+    costs *= np.array([(-1 if m else 1) for m in maximize])
+    return _pareto_ranking(keys, costs, base)
 
-    nodes = []
-    costs = []
-    for i in values.keys():
-        nodes.append(i)
-        costs.append(np.multiply(values[i], weights))
+def _pareto_ranking(keys, costs, base=0.0):
+    """
+    Assign a weight to each key by repeatedly removing the pareto front of
+    `costs` (smaller is better), see metric_pareto().
+    """
 
-    nodes = np.array(nodes)
-    costs = np.array(costs)
+    nodes = np.array(keys)
     weight = 1.0
 
     result = {}
     while len(nodes):
-        front = np.ones(costs.shape[0], dtype=bool)
-        for i, c in enumerate(costs):
-            if front[i]:
-                front[front] = np.any(costs[front] <  c, axis=1) | \
-                               np.all(costs[front] <= c, axis=1)
-
-        for i in np.where(front)[0]:
-            key = nodes[i]
-            if isinstance(key, np.ndarray):
-                key = tuple(key)
-            result[key] = weight
+        front = _pareto_front(costs)
+        keys = nodes[front].tolist()
+        if nodes.ndim > 1:
+            keys = map(tuple, keys)
+        result.update(dict.fromkeys(keys, weight))
 
         nodes = nodes[~front]
         costs = costs[~front]
@@ -922,13 +1136,25 @@ def metric_stability_pareto(values, base=0.0):
     Metric for each node or edge.
     """
 
-    avg = metric_avg(values)
-    std = metric_std(values)
-    return metric_pareto([avg, std], maximize=[True, False], base=base)
+    if not isinstance(values, dict):
+        # Fast-path for list of Graphs and list of Vectors.
+
+        if all(isinstance(v, Graph) for v in values) or \
+           all(isinstance(v, Vector) for v in values):
+            avg = metric_avg(values)
+            std = metric_std(values)
+            return metric_pareto([avg, std], maximize=[True, False], base=base)
+
+    keys, values = _convert_values_matrix(values)
+    if len(keys) == 0:
+        return {}
+
+    avg, std = _row_mean_std(values, ddof=1)
+    return _pareto_ranking(keys, np.column_stack((-avg, std)), base)
 
 class UniformSamples(object):
     def __init__(self, step, offset=0):
-        if step > 0 and np.isinf(step):
+        if step > 0 and math.isinf(step):
             step = 0
         if step != 0:
             offset = offset - (offset // step) * step
@@ -957,38 +1183,40 @@ class Vector(object):
     positive: Enforce that all entries must be positive.
     """
 
+    # Bound at import time, so destructors still work during interpreter
+    # shutdown, when module globals may already have been cleared.
+    _free = staticmethod(lib.free_vector)
+
     def __init__(self, positive=False, obj=None):
         if obj is None:
-            flags = 0
-            flags |= (TVG_FLAGS_POSITIVE if positive else 0)
+            flags = TVG_FLAGS_POSITIVE if positive else 0
             obj = lib.alloc_vector(flags)
 
         self._obj = obj
         if not obj:
             raise MemoryError
 
+        self._revision = c_uint64.from_address(addressof(obj.contents) + c_vector.revision.offset)
+
     def __del__(self):
-        if lib is None:
-            return
         if self._obj:
-            lib.free_vector(self._obj)
+            self._free(self._obj)
             self._obj = None
 
     def _get_obj(self):
-        assert self._obj.contents.refcount >= 2
+        assert c_uint64.from_address(self._obj_addr + _REFCOUNT_OFFSET).value >= 2
         lib.free_vector(self._obj)
         return self
 
     @cacheable
     def __repr__(self):
         max_entries = 10
-        indices = np.empty(shape=(max_entries,), dtype=np.uint64,  order='C')
-        weights = np.empty(shape=(max_entries,), dtype=np.float32, order='C')
+        indices = np.empty(max_entries, dtype=_dtype_uint64)
+        weights = np.empty(max_entries, dtype=_dtype_float32)
         num_entries = lib.vector_get_entries(self._obj, indices, weights, max_entries)
 
-        out = []
-        for i in range(min(num_entries, max_entries)):
-            out.append("%d: %f" % (indices[i], weights[i]))
+        num_shown = min(num_entries, max_entries)
+        out = ["%d: %f" % (i, w) for i, w in zip(indices[:num_shown].tolist(), weights[:num_shown].tolist())]
         if num_entries > max_entries:
             out.append("...")
 
@@ -996,11 +1224,11 @@ class Vector(object):
 
     @property
     def flags(self):
-        return self._obj.contents.flags
+        return c_uint.from_address(self._obj_addr + _VECTOR_FLAGS_OFFSET).value
 
     @property
     def readonly(self):
-        return (self._obj.contents.flags & TVG_FLAGS_READONLY) != 0
+        return (self.flags & TVG_FLAGS_READONLY) != 0
 
     @property
     def revision(self):
@@ -1009,7 +1237,7 @@ class Vector(object):
         whenever the vector is changed. It is also used by the @cacheable decorator
         to check the cache validity.
         """
-        return self._obj.contents.revision
+        return self._revision.value
 
     @property
     @cacheable
@@ -1034,11 +1262,11 @@ class Vector(object):
 
     def has_entry(self, index):
         """ Check if a vector has an entry with index `index`. """
-        return lib.vector_has_entry(self._obj, index)
+        return _vector_has_entry(self._obj, index)
 
     def __getitem__(self, index):
         """ Return entry `index` of the vector, or 0 if it doesn't exist. """
-        return lib.vector_get_entry(self._obj, index)
+        return _vector_get_entry(self._obj, index)
 
     def entries(self, ret_indices=True, ret_weights=True, as_dict=False):
         """
@@ -1057,40 +1285,50 @@ class Vector(object):
             raise ValueError("Invalid parameter combination")
 
         num_entries = self.num_entries
-        while True:
-            max_entries = num_entries
-            indices = np.empty(shape=(max_entries,), dtype=np.uint64,  order='C') if ret_indices else None
-            weights = np.empty(shape=(max_entries,), dtype=np.float32, order='C') if ret_weights else None
-            num_entries = lib.vector_get_entries(self._obj, indices, weights, max_entries)
-            if num_entries <= max_entries:
-                break
-
-        if indices is not None and num_entries < max_entries:
-            indices.resize((num_entries,), refcheck=False)
-        if weights is not None and num_entries < max_entries:
-            weights.resize((num_entries,), refcheck=False)
+        indices, weights = _empty_indices_weights(num_entries, ret_indices, ret_weights, ndim=1)
+        if num_entries:
+            res = lib.vector_get_entries(self._obj, indices, weights, num_entries)
+            assert res == num_entries
 
         if as_dict:
             if weights is None:
-                weights = [None] * num_entries
-            return dict(zip(indices, weights))
+                return dict.fromkeys(indices.tolist())
+            return dict(zip(indices.tolist(), weights.tolist()))
 
         return indices, weights
 
+    def entries_into(self, indices, weights):
+        """
+        Write the entries of a vector into preallocated buffers. This allows to
+        reuse the same buffers when processing many vectors.
+
+        # Arguments
+        indices: Output buffer for indices (1d uint64 numpy array or None).
+        weights: Output buffer for weights (1d float32 numpy array or None).
+
+        # Returns
+        Total number of entries. If this exceeds the size of the buffers,
+        only the first entries have been written.
+        """
+
+        sizes = (_check_buffer(indices, _dtype_uint64, 1), _check_buffer(weights, _dtype_float32, 1))
+        max_entries = min((n for n in sizes if n is not None), default=0)
+        return lib.vector_get_entries(self._obj, indices, weights, max_entries)
+
     def keys(self):
         """ Iterate over indices of a vector. """
         indices, _ = self.entries(ret_weights=False)
-        return iter(indices)
+        return iter(indices.tolist())
 
     def values(self):
         """ Iterate over weights of a vector. """
         _, weights = self.entries(ret_indices=False)
-        return iter(weights)
+        return iter(weights.tolist())
 
     def items(self):
         """ Iterate over indices and weights of a vector. """
         indices, weights = self.entries()
-        return zip(indices, weights)
+        return zip(indices.tolist(), weights.tolist())
 
     def __iter__(self):
         """ Iterate over indices of a vector. """
@@ -1098,61 +1336,46 @@ class Vector(object):
 
     def tolist(self):
         """ Return list of indices of a vector. """
-        return list(self.keys())
+        indices, _ = self.entries(ret_weights=False)
+        return indices.tolist()
 
     @property
-    @cacheable
     def num_entries(self):
         """ Return the number of entries of a vector. """
-        return lib.vector_num_entries(self._obj)
+        return c_uint64.from_address(self._obj_addr + _VECTOR_NUM_ENTRIES_OFFSET).value
 
     def __len__(self):
         """ Return the number of entries of a vector. """
         return self.num_entries
 
     def __setitem__(self, index, weight):
-        """ Set the entry with index `index` of a vector to `weight`. """
-        res = lib.vector_set_entry(self._obj, index, weight)
+        """
+        Set the entry with index `index` of a vector to `weight`.
+        When setting many entries, prefer `update()` or `set_entries()`.
+        """
+        res = _vector_set_entry(self._obj, index, weight)
         if not res:
             raise MemoryError
 
-    @staticmethod
-    def _convert_indices_weights(indices, weights=None):
-        if weights is not None:
-            indices = np.asarray(indices, dtype=np.uint64, order='C')
-            weights = np.asarray(weights, dtype=np.float32, order='C')
-
-            if indices.size == 0 and weights.size == 0:
-                return None, None
-            if len(indices.shape) != 1:
-                raise ValueError("indices array does not have correct dimensions")
-            if len(weights.shape) != 1:
-                raise ValueError("weights array does not have correct dimensions")
-            if indices.shape[0] != weights.shape[0]:
-                raise ValueError("indices/weights arrays have different length")
-
-        elif isinstance(indices, dict):
-            entries = indices
-            if len(entries) == 0:
-                return None, None
-
-            indices = np.empty(shape=(len(entries),), dtype=np.uint64, order='C')
-            weights = np.empty(shape=(len(entries),), dtype=np.float32, order='C')
-            for j, (i, w) in enumerate(entries.items()):
-                indices[j] = i
-                weights[j] = w
+    def update(self, entries):
+        """
+        Set multiple entries of a vector with a single library call.
 
-        else:
-            if isinstance(indices, set):
-                indices = list(indices)
-            indices = np.asarray(indices, dtype=np.uint64, order='C')
+        # Arguments
+        entries: Dictionary `{index: weight}` or iterable of `(index, weight)` pairs.
+        """
 
-            if indices.size == 0:
-                return None, None
-            if len(indices.shape) != 1:
-                raise ValueError("indices array does not have correct dimensions")
+        if not isinstance(entries, dict):
+            entries = dict(entries)
+        if len(entries) == 0:
+            return
 
-        return indices, weights
+        indices = np.fromiter(entries.keys(), dtype=_dtype_uint64, count=len(entries))
+        weights = np.fromiter(entries.values(), dtype=_dtype_float32, count=len(entries))
+
+        res = lib.vector_set_entries(self._obj, indices, weights, indices.shape[0])
+        if not res:
+            raise MemoryError
 
     def set_entries(self, indices, weights=None):
         """
@@ -1164,17 +1387,18 @@ class Vector(object):
         weights: List of weights to set (list or 1d numpy array).
         """
 
-        indices, weights = self._convert_indices_weights(indices, weights)
-        if indices is None:
+        indices, weights = _convert_indices_weights(indices, weights, ndim=1)
+        count = indices.shape[0]
+        if count == 0:
             return
 
-        res = lib.vector_set_entries(self._obj, indices, weights, indices.shape[0])
+        res = lib.vector_set_entries(self._obj, indices, weights, count)
         if not res:
             raise MemoryError
 
     def add_entry(self, index, weight):
         """ Add weight `weight` to the entry with index `index`. """
-        res = lib.vector_add_entry(self._obj, index, weight)
+        res = _vector_add_entry(self._obj, index, weight)
         if not res:
             raise MemoryError
 
@@ -1188,11 +1412,12 @@ class Vector(object):
         weights: List of weights to add (list or 1d numpy array).
         """
 
-        indices, weights = self._convert_indices_weights(indices, weights)
-        if indices is None:
+        indices, weights = _convert_indices_weights(indices, weights, ndim=1)
+        count = indices.shape[0]
+        if count == 0:
             return
 
-        res = lib.vector_add_entries(self._obj, indices, weights, indices.shape[0])
+        res = lib.vector_add_entries(self._obj, indices, weights, count)
         if not res:
             raise MemoryError
 
@@ -1209,7 +1434,7 @@ class Vector(object):
 
     def sub_entry(self, index, weight):
         """ Subtract weight `weight` from the entry with index `index`. """
-        res = lib.vector_sub_entry(self._obj, index, weight)
+        res = _vector_sub_entry(self._obj, index, weight)
         if not res:
             raise MemoryError
 
@@ -1223,11 +1448,12 @@ class Vector(object):
         weights: List of weights to subtract (list or 1d numpy array).
         """
 
-        indices, weights = self._convert_indices_weights(indices, weights)
-        if indices is None:
+        indices, weights = _convert_indices_weights(indices, weights, ndim=1)
+        count = indices.shape[0]
+        if count == 0:
             return
 
-        res = lib.vector_sub_entries(self._obj, indices, weights, indices.shape[0])
+        res = lib.vector_sub_entries(self._obj, indices, weights, count)
         if not res:
             raise MemoryError
 
@@ -1244,7 +1470,7 @@ class Vector(object):
 
     def __delitem__(self, index):
         """ Delete entry `index` from the vector or do nothing if it doesn't exist. """
-        res = lib.vector_del_entry(self._obj, index)
+        res = _vector_del_entry(self._obj, index)
         if not res:
             raise RuntimeError
 
@@ -1256,16 +1482,12 @@ class Vector(object):
         indices: List of indices (list or 1d numpy array).
         """
 
-        if isinstance(indices, set):
-            indices = list(indices)
-        indices = np.asarray(indices, dtype=np.uint64, order='C')
-
-        if indices.size == 0:
-            return # nothing to do for empty array
-        if len(indices.shape) != 1:
-            raise ValueError("indices array does not have correct dimensions")
+        indices = _convert_indices(indices, ndim=1)
+        count = indices.shape[0]
+        if count == 0:
+            return
 
-        res = lib.vector_del_entries(self._obj, indices, indices.shape[0])
+        res = lib.vector_del_entries(self._obj, indices, count)
         if not res:
             raise RuntimeError
 
@@ -1351,39 +1573,39 @@ class Graph(object):
     directed: Create a directed graph.
     """
 
+    _free = staticmethod(lib.free_graph)
+
     def __init__(self, positive=False, directed=False, obj=None):
         if obj is None:
-            flags = 0
-            flags |= (TVG_FLAGS_POSITIVE if positive else 0)
-            flags |= (TVG_FLAGS_DIRECTED if directed else 0)
+            flags = ((TVG_FLAGS_POSITIVE if positive else 0) |
+                     (TVG_FLAGS_DIRECTED if directed else 0))
             obj = lib.alloc_graph(flags)
 
         self._obj = obj
         if not obj:
             raise MemoryError
 
+        self._revision = c_uint64.from_address(addressof(obj.contents) + c_graph.revision.offset)
+
     def __del__(self):
-        if lib is None:
-            return
         if self._obj:
-            lib.free_graph(self._obj)
+            self._free(self._obj)
             self._obj = None
 
     def _get_obj(self):
-        assert self._obj.contents.refcount >= 2
+        assert c_uint64.from_address(self._obj_addr + _REFCOUNT_OFFSET).value >= 2
         lib.free_graph(self._obj)
         return self
 
     @cacheable
     def __repr__(self):
         max_edges = 10
-        indices = np.empty(shape=(max_edges, 2), dtype=np.uint64,  order='C')
-        weights = np.empty(shape=(max_edges,),   dtype=np.float32, order='C')
+        indices = np.empty((max_edges, 2), dtype=_dtype_uint64)
+        weights = np.empty(max_edges, dtype=_dtype_float32)
         num_edges = lib.graph_get_edges(self._obj, indices, weights, max_edges)
 
-        out = []
-        for i in range(min(num_edges, max_edges)):
-            out.append("(%d, %d): %f" % (indices[i][0], indices[i][1], weights[i]))
+        num_shown = min(num_edges, max_edges)
+        out = ["(%d, %d): %f" % (s, t, w) for (s, t), w in zip(indices[:num_shown].tolist(), weights[:num_shown].tolist())]
         if num_edges > max_edges:
             out.append("...")
 
@@ -1391,15 +1613,15 @@ class Graph(object):
 
     @property
     def flags(self):
-        return self._obj.contents.flags
+        return c_uint.from_address(self._obj_addr + _GRAPH_FLAGS_OFFSET).value
 
     @property
     def directed(self):
-        return (self._obj.contents.flags & TVG_FLAGS_DIRECTED) != 0
+        return (self.flags & TVG_FLAGS_DIRECTED) != 0
 
     @property
     def readonly(self):
-        return (self._obj.contents.flags & TVG_FLAGS_READONLY) != 0
+        return (self.flags & TVG_FLAGS_READONLY) != 0
 
     @property
     def revision(self):
@@ -1408,7 +1630,7 @@ class Graph(object):
         whenever the graph is changed. It is also used by the @cacheable decorator
         to check the cache validity.
         """
-        return self._obj.contents.revision
+        return self._revision.value
 
     @property
     def ts(self):
@@ -1416,7 +1638,7 @@ class Graph(object):
         Get the timestamp associated with this graph object. This only applies to
         objects that are part of a time-varying graph.
         """
-        return self._obj.contents.ts
+        return c_uint64.from_address(self._obj_addr + _GRAPH_TS_OFFSET).value
 
     @property
     def id(self):
@@ -1425,13 +1647,13 @@ class Graph(object):
         loaded from an external data source, e.g., from a MongoDB.
         """
 
-        objectid = self._obj.contents.objectid
+        objectid = c_objectid.from_address(self._obj_addr + _GRAPH_OBJECTID_OFFSET)
         if objectid.type == OBJECTID_NONE:
             return None
         if objectid.type == OBJECTID_INT:
             return objectid.lo
         if objectid.type == OBJECTID_OID:
-            return struct.pack(">IQ", objectid.hi, objectid.lo).hex()
+            return _oid_struct.pack(objectid.hi, objectid.lo).hex()
 
         raise NotImplementedError
 
@@ -1451,33 +1673,48 @@ class Graph(object):
         """
 
         objectid = c_objectid()
+        _set_objectid(objectid, id)
 
-        if isinstance(id, int):
-            objectid.lo = id
-            objectid.hi = 0
-            objectid.type = OBJECTID_INT
+        flags = ((TVG_FLAGS_POSITIVE if positive else 0) |
+                 (TVG_FLAGS_DIRECTED if directed else 0))
 
-        elif isinstance(id, bytes) and len(id) == 12:
-            hi, lo = struct.unpack(">IQ", id)
-            objectid.lo = lo
-            objectid.hi = hi
-            objectid.type = OBJECTID_OID
+        obj = lib.mongodb_load_graph(None, mongodb._obj, objectid, flags)
+        return Graph(obj=obj) if obj else None
+
+    @staticmethod
+    def load_many_from_mongodb(mongodb, ids, positive=False, directed=False):
+        """
+        Load multiple graphs from a MongoDB database with a single library call.
 
-        elif isinstance(id, str) and len(id) == 24:
-            hi, lo = struct.unpack(">IQ", bytes.fromhex(id))
-            objectid.lo = lo
-            objectid.hi = hi
-            objectid.type = OBJECTID_OID
+        # Arguments
+        ids: List of identifiers (numeric or objectid) of the documents to load,
+             or a numpy array of numeric identifiers.
+        positive: Enforce that all entries must be positive.
+        directed: Create a directed graph.
 
+        # Returns
+        List of graphs, with None for documents that could not be loaded.
+        """
+
+        num_ids = len(ids)
+        if num_ids == 0:
+            return []
+
+        objectids = (c_objectid * num_ids)()
+        if isinstance(ids, np.ndarray) and np.issubdtype(ids.dtype, np.integer):
+            fields = npc.as_array(objectids)
+            fields['lo'] = ids
+            fields['type'] = OBJECTID_INT
         else:
-            raise ValueError("Objectid is not valid")
+            for objectid, id in zip(objectids, ids):
+                _set_objectid(objectid, id)
 
-        flags = 0
-        flags |= (TVG_FLAGS_POSITIVE if positive else 0)
-        flags |= (TVG_FLAGS_DIRECTED if directed else 0)
+        flags = ((TVG_FLAGS_POSITIVE if positive else 0) |
+                 (TVG_FLAGS_DIRECTED if directed else 0))
 
-        obj = lib.mongodb_load_graph(None, mongodb._obj, objectid, flags)
-        return Graph(obj=obj) if obj else None
+        graphs = (c_graph_p * num_ids)()
+        lib.mongodb_load_graphs(None, mongodb._obj, objectids, num_ids, flags, graphs)
+        return [Graph(obj=obj) if obj else None for obj in graphs]
 
     def unlink(self):
         """ Unlink a graph from the TVG object. """
@@ -1519,12 +1756,12 @@ class Graph(object):
     def has_edge(self, indices):
         """ Check if the graph has edge `(source, target)`. """
         (source, target) = indices
-        return lib.graph_has_edge(self._obj, source, target)
+        return _graph_has_edge(self._obj, source, target)
 
     def __getitem__(self, indices):
         """ Return the weight of edge `(source, target)`. """
         (source, target) = indices
-        return lib.graph_get_edge(self._obj, source, target)
+        return _graph_get_edge(self._obj, source, target)
 
     def edges(self, ret_indices=True, ret_weights=True, as_dict=False):
         """
@@ -1542,43 +1779,77 @@ class Graph(object):
         if as_dict and not ret_indices:
             raise ValueError("Invalid parameter combination")
 
-        num_edges = lib.graph_get_edges(self._obj, None, None, 0)
-        while True:
-            max_edges = num_edges
-            indices = np.empty(shape=(max_edges, 2), dtype=np.uint64,  order='C') if ret_indices else None
-            weights = np.empty(shape=(max_edges,),   dtype=np.float32, order='C') if ret_weights else None
-            num_edges = lib.graph_get_edges(self._obj, indices, weights, max_edges)
-            if num_edges <= max_edges:
-                break
-
-        if indices is not None and num_edges < max_edges:
-            indices.resize((num_edges, 2), refcheck=False)
-        if weights is not None and num_edges < max_edges:
-            weights.resize((num_edges,), refcheck=False)
+        num_edges = self.num_edges
+        indices, weights = _empty_indices_weights(num_edges, ret_indices, ret_weights, ndim=2)
+        if num_edges:
+            res = lib.graph_get_edges(self._obj, indices, weights, num_edges)
+            assert res == num_edges
 
         if as_dict:
             if weights is None:
-                weights = [None] * num_edges
-            return dict((tuple(i), w) for i, w in zip(indices, weights))
+                return dict.fromkeys(map(tuple, indices.tolist()))
+            return dict(zip(map(tuple, indices.tolist()), weights.tolist()))
 
         return indices, weights
 
+    def edges_linear(self, ret_keys=True, ret_weights=True):
+        """
+        Return all edges of a graph with (source, target) packed into a single
+        key `source << 32 | target`. This halves the memory required for the
+        indices, but only works when all node indices fit into 32 bits.
+
+        # Arguments
+        ret_keys: Return keys, otherwise None.
+        ret_weights: Return weights, otherwise None.
+
+        # Returns
+        `(keys, weights)`
+        """
+
+        num_edges = self.num_edges
+        keys = np.empty(num_edges, dtype=_dtype_uint64) if ret_keys else None
+        weights = np.empty(num_edges, dtype=_dtype_float32) if ret_weights else None
+        if num_edges:
+            res = lib.graph_get_edges_linear(self._obj, keys, weights, num_edges)
+            if res == 0xffffffffffffffff:
+                raise ValueError("node indices do not fit into 32 bits")
+            assert res == num_edges
+
+        return keys, weights
+
+    def edges_into(self, indices, weights):
+        """
+        Write the edges of a graph into preallocated buffers. This allows to
+        reuse the same buffers when processing many graphs.
+
+        # Arguments
+        indices: Output buffer for indices (2d uint64 numpy array with
+                 shape (N, 2) or None).
+        weights: Output buffer for weights (1d float32 numpy array or None).
+
+        # Returns
+        Total number of edges. If this exceeds the size of the buffers,
+        only the first edges have been written.
+        """
+
+        sizes = (_check_buffer(indices, _dtype_uint64, 2), _check_buffer(weights, _dtype_float32, 1))
+        max_edges = min((n for n in sizes if n is not None), default=0)
+        return lib.graph_get_edges(self._obj, indices, weights, max_edges)
+
     def keys(self):
         """ Iterate over indices of a graphs. """
         indices, _ = self.edges(ret_weights=False)
-        for i in indices:
-            yield tuple(i)
+        return map(tuple, indices.tolist())
 
     def values(self):
         """ Iterate over weights of a graph. """
         _, weights = self.edges(ret_indices=False)
-        return iter(weights)
+        return iter(weights.tolist())
 
     def items(self):
         """ Iterate over indices and weights of a graphs. """
         indices, weights = self.edges()
-        for i, w in zip(indices, weights):
-            yield (tuple(i), w)
+        return zip(map(tuple, indices.tolist()), weights.tolist())
 
     def __iter__(self):
         """ Iterate over indices of a graph. """
@@ -1603,11 +1874,13 @@ class Graph(object):
         if as_dict and not ret_indices:
             raise ValueError("Invalid parameter combination")
 
-        num_edges = max_edges
+        # The result never contains more than all edges of the graph, so
+        # avoid allocating oversized buffers for large limits.
+        num_edges = min(max_edges, self.num_edges)
         while True:
             max_edges = num_edges
-            indices = np.empty(shape=(max_edges, 2), dtype=np.uint64,  order='C') if ret_indices else None
-            weights = np.empty(shape=(max_edges,),   dtype=np.float32, order='C') if ret_weights else None
+            indices = np.empty((max_edges, 2), dtype=_dtype_uint64) if ret_indices else None
+            weights = np.empty(max_edges, dtype=_dtype_float32) if ret_weights else None
             num_edges = lib.graph_get_top_edges(self._obj, indices, weights, max_edges)
             if truncate:
                 break
@@ -1621,8 +1894,8 @@ class Graph(object):
 
         if as_dict:
             if weights is None:
-                weights = [None] * num_edges
-            return collections.OrderedDict((tuple(i), w) for i, w in zip(indices, weights))
+                return collections.OrderedDict.fromkeys(map(tuple, indices.tolist()))
+            return collections.OrderedDict(zip(map(tuple, indices.tolist()), weights.tolist()))
 
         return indices, weights
 
@@ -1639,6 +1912,9 @@ class Graph(object):
         connected to at least one other node (either as a source or target). For MongoDB
         graphs, a node is present when it appears at least once in the occurrence list
         (even if it doesn't co-occur with any other node).
+
+        The returned vector is read-only, so it is shared between calls as long as
+        the graph does not change.
         """
         return Vector(obj=lib.graph_get_nodes(self._obj))
 
@@ -1665,24 +1941,16 @@ class Graph(object):
         if as_dict and not ret_indices:
             raise ValueError("Invalid parameter combination")
 
-        num_edges = 100 # FIXME: Arbitrary limit.
-        while True:
-            max_edges = num_edges
-            indices = np.empty(shape=(max_edges,), dtype=np.uint64,  order='C') if ret_indices else None
-            weights = np.empty(shape=(max_edges,), dtype=np.float32, order='C') if ret_weights else None
-            num_edges = lib.graph_get_adjacent_edges(self._obj, source, indices, weights, max_edges)
-            if num_edges <= max_edges:
-                break
-
-        if indices is not None and num_edges < max_edges:
-            indices.resize((num_edges,), refcheck=False)
-        if weights is not None and num_edges < max_edges:
-            weights.resize((num_edges,), refcheck=False)
+        num_edges = lib.graph_get_adjacent_edges(self._obj, source, None, None, 0)
+        indices, weights = _empty_indices_weights(num_edges, ret_indices, ret_weights, ndim=1)
+        if num_edges:
+            res = lib.graph_get_adjacent_edges(self._obj, source, indices, weights, num_edges)
+            assert res == num_edges
 
         if as_dict:
             if weights is None:
-                weights = [None] * num_edges
-            return dict(zip(indices, weights))
+                return dict.fromkeys(indices.tolist())
+            return dict(zip(indices.tolist(), weights.tolist()))
 
         return indices, weights
 
@@ -1695,49 +1963,39 @@ class Graph(object):
         return self.num_edges
 
     def __setitem__(self, indices, weight):
-        """ Set edge `(source, target)` of a graph to `weight`."""
+        """
+        Set edge `(source, target)` of a graph to `weight`.
+        When setting many edges, prefer `update()` or `set_edges()`.
+        """
         (source, target) = indices
-        res = lib.graph_set_edge(self._obj, source, target, weight)
+        res = _graph_set_edge(self._obj, source, target, weight)
         if not res:
             raise MemoryError
 
-    @staticmethod
-    def _convert_indices_weights(indices, weights=None):
-        if weights is not None:
-            indices = np.asarray(indices, dtype=np.uint64, order='C')
-            weights = np.asarray(weights, dtype=np.float32, order='C')
-
-            if indices.size == 0 and weights.size == 0:
-                return None, None
-            if len(indices.shape) != 2 or indices.shape[1] != 2:
-                raise ValueError("indices array does not have correct dimensions")
-            if len(weights.shape) != 1:
-                raise ValueError("weights array does not have correct dimensions")
-            if indices.shape[0] != weights.shape[0]:
-                raise ValueError("indices/weights arrays have different length")
-
-        elif isinstance(indices, dict):
-            edges = indices
-            if len(edges) == 0:
-                return None, None
-
-            indices = np.empty(shape=(len(edges), 2), dtype=np.uint64, order='C')
-            weights = np.empty(shape=(len(edges),), dtype=np.float32, order='C')
-            for j, (i, w) in enumerate(edges.items()):
-                indices[j, :] = i
-                weights[j] = w
+    def update(self, edges):
+        """
+        Set multiple edges of a graph with a single library call.
 
-        else:
-            if isinstance(indices, set):
-                indices = list(indices)
-            indices = np.asarray(indices, dtype=np.uint64, order='C')
+        # Arguments
+        edges: Dictionary `{(source, target): weight}` or iterable of
+               `(source, target, weight)` tuples.
+        """
 
-            if indices.size == 0:
-                return None, None
-            if len(indices.shape) != 2 or indices.shape[1] != 2:
-                raise ValueError("indices array does not have correct dimensions")
+        if isinstance(edges, dict):
+            edges = [(source, target, weight) for (source, target), weight in edges.items()]
+        elif not isinstance(edges, (list, tuple)):
+            edges = list(edges)
+        if len(edges) == 0:
+            return
 
-        return indices, weights
+        indices = np.fromiter((i for source, target, _ in edges for i in (source, target)),
+                              dtype=_dtype_uint64, count=2 * len(edges)).reshape((len(edges), 2))
+        weights = np.fromiter((weight for _, _, weight in edges),
+                              dtype=_dtype_float32, count=len(edges))
+
+        res = lib.graph_set_edges(self._obj, indices, weights, indices.shape[0])
+        if not res:
+            raise MemoryError
 
     def set_edges(self, indices, weights=None):
         """
@@ -1749,18 +2007,19 @@ class Graph(object):
         weights: List of weights to set (list or 1d numpy array).
         """
 
-        indices, weights = self._convert_indices_weights(indices, weights)
-        if indices is None:
+        indices, weights = _convert_indices_weights(indices, weights, ndim=2)
+        count = indices.shape[0]
+        if count == 0:
             return
 
-        res = lib.graph_set_edges(self._obj, indices, weights, indices.shape[0])
+        res = lib.graph_set_edges(self._obj, indices, weights, count)
         if not res:
             raise MemoryError
 
     def add_edge(self, indices, weight):
         """ Add weight `weight` to edge `(source, target)`. """
         (source, target) = indices
-        res = lib.graph_add_edge(self._obj, source, target, weight)
+        res = _graph_add_edge(self._obj, source, target, weight)
         if not res:
             raise MemoryError
 
@@ -1774,11 +2033,12 @@ class Graph(object):
         weights: List of weights to set (list or 1d numpy array).
         """
 
-        indices, weights = self._convert_indices_weights(indices, weights)
-        if indices is None:
+        indices, weights = _convert_indices_weights(indices, weights, ndim=2)
+        count = indices.shape[0]
+        if count == 0:
             return
 
-        res = lib.graph_add_edges(self._obj, indices, weights, indices.shape[0])
+        res = lib.graph_add_edges(self._obj, indices, weights, count)
         if not res:
             raise MemoryError
 
@@ -1796,7 +2056,7 @@ class Graph(object):
     def sub_edge(self, indices, weight):
         """ Subtract weight `weight` from edge `(source, target)`. """
         (source, target) = indices
-        res = lib.graph_sub_edge(self._obj, source, target, weight)
+        res = _graph_sub_edge(self._obj, source, target, weight)
         if not res:
             raise MemoryError
 
@@ -1810,11 +2070,12 @@ class Graph(object):
         weights: List of weights to set (list or 1d numpy array).
         """
 
-        indices, weights = self._convert_indices_weights(indices, weights)
-        if indices is None:
+        indices, weights = _convert_indices_weights(indices, weights, ndim=2)
+        count = indices.shape[0]
+        if count == 0:
             return
 
-        res = lib.graph_sub_edges(self._obj, indices, weights, indices.shape[0])
+        res = lib.graph_sub_edges(self._obj, indices, weights, count)
         if not res:
             raise MemoryError
 
@@ -1832,7 +2093,7 @@ class Graph(object):
     def __delitem__(self, indices):
         """ Delete edge `(source, target)` from the graph or do nothing if it doesn't exist. """
         (source, target) = indices
-        res = lib.graph_del_edge(self._obj, source, target)
+        res = _graph_del_edge(self._obj, source, target)
         if not res:
             raise RuntimeError
 
@@ -1844,16 +2105,12 @@ class Graph(object):
         indices: List of indices (list of tuples or 2d numpy array).
         """
 
-        if isinstance(indices, set):
-            indices = list(indices)
-        indices = np.asarray(indices, dtype=np.uint64, order='C')
-
-        if indices.size == 0:
-            return # nothing to do for empty array
-        if len(indices.shape) != 2 or indices.shape[1] != 2:
-            raise ValueError("indices array does not have correct dimensions")
+        indices = _convert_indices(indices, ndim=2)
+        count = indices.shape[0]
+        if count == 0:
+            return
 
-        res = lib.graph_del_edges(self._obj, indices, indices.shape[0])
+        res = lib.graph_del_edges(self._obj, indices, count)
         if not res:
             raise RuntimeError
 
@@ -1869,6 +2126,27 @@ class Graph(object):
         if not res:
             raise RuntimeError
 
+    def apply_delta(self, indices, weights=None, eps=0.0):
+        """
+        Add weights to multiple edges and drop those which become smaller than
+        `eps`. This is equivalent to `add_edges()` followed by `del_small()`,
+        but only touches the updated edges.
+
+        # Arguments
+        indices: List of indices (list of tuples or 2d numpy array).
+        weights: List of weights to add (list or 1d numpy array).
+        eps: Threshold for dropping edges.
+        """
+
+        indices, weights = _convert_indices_weights(indices, weights, ndim=2)
+        count = indices.shape[0]
+        if count == 0:
+            return
+
+        res = lib.graph_apply_delta(self._obj, indices, weights, count, eps)
+        if not res:
+            raise MemoryError
+
     def mul_vector(self, other):
         """ Compute the matrix-vector product of the graph with vector `other`. """
         # FIXME: Check type of 'other'.
@@ -1890,6 +2168,22 @@ class Graph(object):
         """ Compute and return a vector of out-weights. """
         return Vector(obj=lib.graph_out_weights(self._obj))
 
+    def degrees_weights(self):
+        """
+        Compute in-degrees, in-weights, out-degrees and out-weights in a single
+        pass over the edges of the graph.
+
+        # Returns
+        `(in_degrees, in_weights, out_degrees, out_weights)`
+        """
+
+        vectors = [c_vector_p() for i in range(4)]
+        res = lib.graph_degrees_weights(self._obj, *vectors)
+        if not res:
+            raise MemoryError
+
+        return tuple(Vector(obj=obj) for obj in vectors)
+
     def degree_anomalies(self):
         """ Compute and return a vector of degree anomalies. """
         return Vector(obj=lib.graph_degree_anomalies(self._obj))
@@ -1927,6 +2221,94 @@ class Graph(object):
             eigenvalue = eigenvalue.value
         return vector, eigenvalue
 
+    def lanczos(self, initial_guess=None, num_iterations=0, tolerance=None, ret_eigenvalue=True):
+        """
+        Like power_iteration(), but use the Lanczos algorithm (with full
+        reorthogonalization). For tight tolerances, this usually requires far
+        fewer iterations. Only supported for undirected graphs.
+
+        The Krylov basis is kept in memory, which requires 8 bytes per node and
+        iteration (about 800 MB for 100 iterations on a graph with 1M nodes).
+        For very large graphs, limit `num_iterations` or use power_iteration().
+
+        # Arguments
+        initial_guess: Initial guess for the solver.
+        num_iterations: Maximum number of iterations.
+        tolerance: Desired tolerance, relative to the eigenvalue.
+        ret_eigenvalue: Also return the eigenvalue.
+
+        # Returns
+        `(eigenvector, eigenvalue)`
+        """
+
+        if self.directed:
+            raise NotImplementedError("Not implemented for directed graphs")
+
+        if not num_iterations:
+            num_iterations = 100
+        if tolerance is None:
+            tolerance = 0.0
+
+        indices, weights = self.edges()
+        nodes = np.unique(indices)
+        num_nodes = len(nodes)
+        if num_nodes == 0:
+            return Vector(), (0.0 if ret_eigenvalue else None)
+
+        # Symmetric adjacency matrix in coordinate format.
+        pos = np.searchsorted(nodes, indices)
+        loops = (pos[:, 0] == pos[:, 1])
+        rows = np.concatenate((pos[:, 0], pos[~loops, 1]))
+        cols = np.concatenate((pos[:, 1], pos[~loops, 0]))
+        vals = np.concatenate((weights, weights[~loops])).astype(np.float64)
+
+        def matvec(x):
+            return np.bincount(rows, weights=vals * x[cols], minlength=num_nodes)
+
+        # Like power_iteration(), use random values for entries missing in the guess.
+        x = np.random.random(num_nodes)
+        if initial_guess is not None:
+            keys, guess = initial_guess.entries()
+            p = np.minimum(np.searchsorted(nodes, keys), num_nodes - 1)
+            valid = (nodes[p] == keys) & (guess != 0.0)
+            x[p[valid]] = guess[valid]
+
+        # The basis only grows as far as needed, and the small eigenproblem
+        # is only solved every few iterations to check for convergence.
+        num_iterations = min(num_iterations, num_nodes)
+        check_interval = 8
+        basis = [x / np.linalg.norm(x)]
+        alpha = []
+        beta = []
+
+        for k in range(num_iterations):
+            w = matvec(basis[k])
+            alpha.append(np.dot(w, basis[k]))
+            for _ in range(2):
+                for v in basis:
+                    w -= np.dot(v, w) * v
+            norm = np.linalg.norm(w)
+
+            done = (k + 1 == num_iterations or norm == 0.0)
+            if done or (tolerance > 0.0 and (k + 1) % check_interval == 0):
+                T = np.diag(alpha) + np.diag(beta, 1) + np.diag(beta, -1)
+                theta, S = np.linalg.eigh(T)
+                j = np.argmax(np.abs(theta))
+                if done or norm * abs(S[-1, j]) <= tolerance * abs(theta[j]):
+                    break
+
+            beta.append(norm)
+            basis.append(w / norm)
+
+        eigenvector = np.dot(S[:, j], basis)
+        eigenvector /= np.linalg.norm(eigenvector)
+        if np.sum(eigenvector) < 0.0:
+            eigenvector = -eigenvector
+
+        vector = Vector()
+        vector.set_entries(nodes, eigenvector)
+        return vector, (float(theta[j]) if ret_eigenvalue else None)
+
     def filter_nodes(self, nodes):
         """
         Create a subgraph by only keeping edges, where at least one node is
@@ -2035,26 +2417,10 @@ class Graph(object):
         List of tuples `(weight, count, edge_from, edge_to)`.
         """
 
-        result = []
-
         if max_count is None:
             max_count = 0xffffffffffffffff
 
-        @c_bfs_callback_p
-        def callback(graph, entry, userdata):
-            if entry.contents.count > max_count:
-                return 1
-
-            entry = entry.contents
-            edge_from = entry.edge_from if entry.edge_from != 0xffffffffffffffff else None
-            result.append((entry.weight, entry.count, edge_from, entry.edge_to))
-            return 0
-
-        res = lib.graph_bfs(self._obj, source, 0, callback, None)
-        if not res:
-            raise RuntimeError
-
-        return result
+        return self._bfs_collect(source, 0, max_count, np.inf)
 
     def bfs_weight(self, source, max_weight=np.inf):
         """
@@ -2069,22 +2435,25 @@ class Graph(object):
         List of tuples `(weight, count, edge_from, edge_to)`.
         """
 
-        result = []
-
-        @c_bfs_callback_p
-        def callback(graph, entry, userdata):
-            if entry.contents.weight > max_weight:
-                return 1
+        return self._bfs_collect(source, 1, 0xffffffffffffffff, max_weight)
 
-            entry = entry.contents
-            edge_from = entry.edge_from if entry.edge_from != 0xffffffffffffffff else None
-            result.append((entry.weight, entry.count, edge_from, entry.edge_to))
-            return 0
-
-        res = lib.graph_bfs(self._obj, source, 1, callback, None)
-        if not res:
+    def _bfs_collect(self, source, use_weights, max_count, max_weight):
+        # Each node is visited at most once, so the number of nodes (plus the
+        # source, which might not be part of the graph) bounds the result size.
+        max_entries = self.num_nodes + 1
+        entries = np.empty(max_entries, dtype=_dtype_bfs_entry)
+        res = lib.graph_bfs_collect(self._obj, source, use_weights, max_count,
+                                    max_weight, entries, max_entries)
+        if res == 0xffffffffffffffff:
             raise RuntimeError
-
+        assert res <= max_entries
+
+        # Records from tolist() are already tuples in the expected order. Only
+        # the first entry (the source itself) has no predecessor.
+        result = entries[:res].tolist()
+        if res and result[0][2] == 0xffffffffffffffff:
+            weight, count, _, edge_to = result[0]
+            result[0] = (weight, count, None, edge_to)
         return result
 
     def distance_count(self, source, end):
@@ -2124,11 +2493,12 @@ class GraphIter(object):
         self._graph = graph
 
     def __next__(self):
-        if self._graph is None:
+        result = self._graph
+        if result is None:
             raise StopIteration
 
-        result = self._graph
-        self._graph = result.next
+        obj = lib.next_graph(result._obj)
+        self._graph = Graph(obj=obj) if obj else None
         return result
 
 class GraphIterReversed(object):
@@ -2139,11 +2509,12 @@ class GraphIterReversed(object):
         return self
 
     def __next__(self):
-        if self._graph is None:
+        result = self._graph
+        if result is None:
             raise StopIteration
 
-        result = self._graph
-        self._graph = result.prev
+        obj = lib.prev_graph(result._obj)
+        self._graph = Graph(obj=obj) if obj else None
         return result
 
 @libtvgobject
@@ -2161,6 +2532,8 @@ class Node(object):
     **kwargs: Key-value pairs of type string to assign to the node.
     """
 
+    _free = staticmethod(lib.free_node)
+
     def __init__(self, obj=None, **kwargs):
         if obj is None:
             obj = lib.alloc_node()
@@ -2173,14 +2546,12 @@ class Node(object):
             self[k] = v
 
     def __del__(self):
-        if lib is None:
-            return
         if self._obj:
-            lib.free_node(self._obj)
+            self._free(self._obj)
             self._obj = None
 
     def _get_obj(self):
-        assert self._obj.contents.refcount >= 2
+        assert c_uint64.from_address(self._obj_addr + _REFCOUNT_OFFSET).value >= 2
         lib.free_node(self._obj)
         return self
 
@@ -2190,7 +2561,7 @@ class Node(object):
     @property
     def index(self):
         """ Return the index of the node. """
-        return self._obj.contents.index
+        return c_uint64.from_address(self._obj_addr + _NODE_INDEX_OFFSET).value
 
     @property
     def text(self):
@@ -2208,13 +2579,13 @@ class Node(object):
 
     def __setitem__(self, key, value):
         """ Set the node attribute `key` to `value`. Both key and value must have the type string. """
-        res = lib.node_set_attribute(self._obj, key.encode("utf-8"), value.encode("utf-8"))
+        res = lib.node_set_attribute(self._obj, _encode_key(key), value.encode("utf-8"))
         if not res:
             raise KeyError
 
     def __getitem__(self, key):
         """ Return the node attribute for `key`. """
-        value = lib.node_get_attribute(self._obj, key.encode("utf-8"))
+        value = lib.node_get_attribute(self._obj, _encode_key(key))
         if not value:
             raise KeyError
         return value.decode("utf-8")
@@ -2225,15 +2596,17 @@ class Node(object):
         if not ptr:
             raise MemoryError
 
-        data = {}
-        for i in itertools.count(step=2):
-            if not ptr[i]: break
-            key = ptr[i].decode("utf-8")
-            value = ptr[i + 1].decode("utf-8")
-            data[key] = value
+        # Dereference each pointer only once, then decode all strings
+        # and build the dictionary in bulk.
+        raw = []
+        for i in itertools.count():
+            value = ptr[i]
+            if value is None: break
+            raw.append(value)
 
         libc.free(ptr)
-        return data
+        raw = [value.decode("utf-8") for value in raw]
+        return dict(zip(raw[0::2], raw[1::2]))
 
 @libtvgobject
 class TVG(object):
@@ -2247,12 +2620,13 @@ class TVG(object):
     primary_key: List or semicolon separated string of attributes.
     """
 
+    _free = staticmethod(lib.free_tvg)
+
     def __init__(self, positive=False, directed=False, streaming=False, primary_key=None, obj=None):
         if obj is None:
-            flags = 0
-            flags |= (TVG_FLAGS_POSITIVE if positive else 0)
-            flags |= (TVG_FLAGS_DIRECTED if directed else 0)
-            flags |= (TVG_FLAGS_STREAMING if streaming else 0)
+            flags = ((TVG_FLAGS_POSITIVE if positive else 0) |
+                     (TVG_FLAGS_DIRECTED if directed else 0) |
+                     (TVG_FLAGS_STREAMING if streaming else 0))
             obj = lib.alloc_tvg(flags)
 
         self._obj = obj
@@ -2263,24 +2637,22 @@ class TVG(object):
             self.set_primary_key(primary_key)
 
     def __del__(self):
-        if lib is None:
-            return
         if self._obj:
-            lib.free_tvg(self._obj)
+            self._free(self._obj)
             self._obj = None
 
     def _get_obj(self):
-        assert self._obj.contents.refcount >= 2
+        assert c_uint64.from_address(self._obj_addr + _REFCOUNT_OFFSET).value >= 2
         lib.free_tvg(self._obj)
         return self
 
     @property
     def flags(self):
-        return self._obj.contents.flags
+        return c_uint.from_address(self._obj_addr + _TVG_FLAGS_OFFSET).value
 
     @property
     def verbosity(self):
-        return self._obj.contents.verbosity
+        return c_int.from_address(self._obj_addr + _TVG_VERBOSITY_OFFSET).value
 
     @verbosity.setter
     def verbosity(self, verbosity):
@@ -2576,7 +2948,7 @@ class TVG(object):
         if log_beta is None:
             log_beta = math.log(beta)
 
-        return self.sum_edges_exp(ts_min, ts_max, log_beta=log_beta, weight=-np.expm1(log_beta), eps=eps)
+        return self.sum_edges_exp(ts_min, ts_max, log_beta=log_beta, weight=-math.expm1(log_beta), eps=eps)
 
     def count_edges(self, ts_min=0, ts_max=0xffffffffffffffff):
         """
@@ -2635,7 +3007,8 @@ class TVG(object):
         @c_snapshot_callback_p
         def callback(ts, entry, userdata):
             try:
-                entry.contents.ts_min, entry.contents.ts_max = samples(ts)
+                entry = entry.contents
+                entry.ts_min, entry.ts_max = samples(ts)
             except:
                 traceback.print_exc()
                 return 0
@@ -2676,14 +3049,17 @@ class TVG(object):
 
         result = []
 
-        for ts in np.linspace(ts_min, ts_max - sample_width + 1, sample_steps):
+        # Convert the sample positions to native floats once, to avoid a
+        # slow numpy scalar -> int conversion in each iteration.
+        timestamps = np.linspace(ts_min, ts_max - sample_width + 1, sample_steps).tolist()
+        for ts in timestamps:
             graph = method(int(ts), int(ts + sample_width - 1), *args, **kwargs)
             result.append(graph)
 
         return result
 
     def sample_eigenvectors(self, ts_min, ts_max, sample_width, sample_steps=9,
-                            tolerance=None, method=None, *args, **kwargs):
+                            tolerance=None, method=None, *args, solver='power', **kwargs):
         """
         Iterative power iteration algorithm to track eigenvectors of a graph over time.
         Eigenvectors are collected within the timeframe [ts_min, ts_max]. Each entry
@@ -2697,18 +3073,26 @@ class TVG(object):
         sample_steps: Number of values to collect.
         tolerance: Tolerance for the power_iteration algorithm.
         method: Method to use (default: 'sum_edges').
+        solver: Either 'power' (Graph.power_iteration) or 'lanczos' (Graph.lanczos).
 
         # Returns
         Dictionary containing lists of collected values for each node.
         """
 
+        if solver == 'power':
+            solve = Graph.power_iteration
+        elif solver == 'lanczos':
+            solve = Graph.lanczos
+        else:
+            raise ValueError("Unknown solver %r" % (solver,))
+
         eigenvector = None
         result = []
 
         for graph in self.sample_graphs(ts_min, ts_max, sample_width, sample_steps=sample_steps,
                                         method=method, *args, **kwargs):
-            eigenvector, _ = graph.power_iteration(initial_guess=eigenvector, tolerance=tolerance,
-                                                   ret_eigenvalue=False)
+            eigenvector, _ = solve(graph, initial_guess=eigenvector, tolerance=tolerance,
+                                   ret_eigenvalue=False)
             result.append(eigenvector)
 
         return result
@@ -2765,7 +3149,8 @@ class TVG(object):
         @c_snapshot_callback_p
         def callback(ts, entry, userdata):
             try:
-                entry.contents.ts_min, entry.contents.ts_max = samples(ts)
+                entry = entry.contents
+                entry.ts_min, entry.ts_max = samples(ts)
             except:
                 traceback.print_exc()
                 return 0
@@ -2805,6 +3190,8 @@ class MongoDB(object):
     max_distance: Maximum distance of mentions.
     """
 
+    _free = staticmethod(lib.free_mongodb)
+
     def __init__(self, uri, database, col_articles, article_id, article_time,
                  col_entities, entity_doc, entity_sen, entity_ent, use_pool=True,
                  load_nodes=False, sum_weights=True, norm_weights=False, max_distance=None,
@@ -2834,13 +3221,11 @@ class MongoDB(object):
             raise MemoryError
 
     def __del__(self):
-        if lib is None:
-            return
         if self._obj:
-            lib.free_mongodb(self._obj)
+            self._free(self._obj)
             self._obj = None
 
     def _get_obj(self):
-        assert self._obj.contents.refcount >= 2
+        assert c_uint64.from_address(self._obj_addr + _REFCOUNT_OFFSET).value >= 2
         lib.free_mongodb(self._obj)
         return self
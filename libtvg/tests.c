@@ -375,9 +375,12 @@ static void test_vector_get_entry(void)
     vector_add_entry(vector, 8, 4.0);
     vector_add_entry(vector, 4, 2.0);
     vector_add_entry(vector, 6, 3.0);
+    vector_add_entry(vector, 6, 0.0);
+    assert(vector_num_entries(vector) == 4);
 
     vector2 = vector_duplicate(vector);
     assert(vector2 != NULL);
+    assert(vector_num_entries(vector2) == 4);
 
     for (i = 0; i < 11; i++)
     {
@@ -407,6 +410,9 @@ static void test_vector_get_entry(void)
         assert(vector_get_entry(vector, i) == 0.0);
     }
 
+    assert(vector_num_entries(vector) == 0);
+    assert(vector_num_entries(vector2) == 4);
+
     for (i = 0; i < 11; i++)
     {
         weight = vector_get_entry(vector2, i);
@@ -595,6 +601,7 @@ static void test_vector_bits(void)
 static void test_vector_optimize(void)
 {
     struct vector *vector;
+    uint64_t indices[10];
     uint64_t i;
 
     /* 16 */
@@ -622,6 +629,11 @@ static void test_vector_optimize(void)
         vector_add_entry(vector, i, 1.0 + i);
 
     assert(vector->bits == 6);
+    assert(vector_num_entries(vector) == 4096);
+
+    vector_del_small(vector, 2048.0);
+    assert(vector_num_entries(vector) == 2048);
+    assert(vector_get_entries(vector, indices, NULL, 10) == 2048);
     free_vector(vector);
 }
 
@@ -1099,6 +1111,7 @@ static void test_graph_for_each_directed_edge(void)
 {
     struct graph *graph;
     struct entry2 *edge;
+    uint64_t indices[20];
     uint64_t num_edges = 0;
     uint64_t i, j, count;
     int ret;
@@ -1128,6 +1141,7 @@ static void test_graph_for_each_directed_edge(void)
             }
             assert(count == num_edges);
             assert(graph_num_edges(graph) == num_edges);
+            assert(graph_get_edges(graph, indices, NULL, 10) == num_edges);
 
             ret = graph_inc_bits_source(graph);
             assert(ret);
@@ -1145,6 +1159,7 @@ static void test_graph_for_each_undirected_edge(void)
 {
     struct graph *graph;
     struct entry2 *edge;
+    uint64_t indices[20];
     uint64_t num_edges = 0;
     uint64_t i, j, count;
     int ret;
@@ -1175,6 +1190,7 @@ static void test_graph_for_each_undirected_edge(void)
             }
             assert(count == num_edges);
             assert(graph_num_edges(graph) == num_edges);
+            assert(graph_get_edges(graph, indices, NULL, 10) == num_edges);
 
             ret = graph_inc_bits_source(graph);
             assert(ret);
@@ -1373,7 +1389,9 @@ static int _bfs_callback(struct graph *graph, const struct bfs_entry *entry, voi
 
 static void test_graph_bfs(void)
 {
+    struct bfs_entry entries[5];
     struct graph *graph;
+    uint64_t count;
     size_t state;
     int ret;
 
@@ -1395,6 +1413,18 @@ static void test_graph_bfs(void)
     assert(ret == 1);
     assert(state == 5);
 
+    count = graph_bfs_collect(graph, 0, 0, ~0ULL, INFINITY, entries, 5);
+    assert(count == 5);
+    assert(entries[4].to == 4);
+    assert(entries[4].weight == 3.5);
+
+    count = graph_bfs_collect(graph, 0, 0, 2, INFINITY, entries, 5);
+    assert(count == 3);
+    assert(entries[2].to == 2);
+
+    count = graph_bfs_collect(graph, 0, 1, ~0ULL, 2.0, NULL, 0);
+    assert(count == 3);
+
     free_graph(graph);
 }
 
@@ -214,6 +214,13 @@ class VectorTests(unittest.TestCase):
         self.assertEqual(indices.tolist(), [0, 1, 2])
         self.assertEqual(weights.tolist(), [1.0, 1.0, 1.0])
 
+        v.update({})
+        v.update({0: 4.0, 2: 5.0})
+        v.update([(1, 6.0)])
+        indices, weights = v.entries()
+        self.assertEqual(indices.tolist(), [0, 1, 2])
+        self.assertEqual(weights.tolist(), [4.0, 6.0, 5.0])
+
         v.del_entries(set())
         v.del_entries(set(test_indices.tolist()))
         self.assertEqual(v.entries()[0].tolist(), [])
@@ -223,11 +230,7 @@ class VectorTests(unittest.TestCase):
         for i in range(1000):
             v.add_entry(i, 1.0)
         indices, _ = v.entries(ret_weights=False)
-        indices = list(indices)
-        for i in range(1000):
-            self.assertIn(i, indices)
-            indices.remove(i)
-        self.assertEqual(len(indices), 0)
+        self.assertEqual(sorted(indices.tolist()), list(range(1000)))
         self.assertEqual(v.num_entries, 1000)
         self.assertEqual(len(v), 1000)
 
@@ -426,6 +429,27 @@ class VectorTests(unittest.TestCase):
 
         del v
 
+    def test_entries_into(self):
+        v = Vector()
+        v[0] = 1.0
+        v[1] = 2.0
+
+        indices = np.empty(shape=(3,), dtype=np.uint64)
+        weights = np.empty(shape=(3,), dtype=np.float32)
+        self.assertEqual(v.entries_into(indices, weights), 2)
+        self.assertEqual(sorted(indices[:2].tolist()), [0, 1])
+        self.assertEqual(sorted(weights[:2].tolist()), [1.0, 2.0])
+
+        self.assertEqual(v.entries_into(indices[:1], None), 2)
+        self.assertEqual(v.entries_into(None, None), 2)
+
+        with self.assertRaises(ValueError):
+            v.entries_into(np.empty(shape=(3,), dtype=np.int64), None)
+        with self.assertRaises(ValueError):
+            v.entries_into(None, weights[::2])
+
+        del v
+
     def test_duplicate(self):
         v = Vector()
 
@@ -637,6 +661,47 @@ class GraphTests(unittest.TestCase):
 
         del g
 
+    def test_lanczos(self):
+        g = Graph()
+        g[0, 0] = 0.5
+        g[0, 1] = 0.5
+        g[1, 2] = 0.3
+        g[2, 2] = 0.8
+        g[2, 3] = 0.1
+
+        v1, e1 = g.power_iteration(num_iterations=1000)
+        v2, e2 = g.lanczos()
+        self.assertTrue(abs(e1 - e2) < 1e-6)
+        for i in range(4):
+            self.assertTrue(abs(v1[i] - v2[i]) < 1e-6)
+        del v2
+
+        v2, e2 = g.lanczos(tolerance=1e-3, ret_eigenvalue=False)
+        self.assertEqual(e2, None)
+        for i in range(4):
+            self.assertTrue(abs(v1[i] - v2[i]) < 1e-2)
+        del v2
+
+        v2, _ = g.lanczos(initial_guess=v1)
+        for i in range(4):
+            self.assertTrue(abs(v1[i] - v2[i]) < 1e-6)
+        del v1
+        del v2
+
+        g.mul_const(-1)
+        v, e = g.lanczos()
+        self.assertTrue(abs(e + e1) < 1e-6)
+        del v
+
+        v, e = Graph().lanczos()
+        self.assertEqual(v.as_dict(), {})
+        del v
+
+        with self.assertRaises(NotImplementedError):
+            Graph(directed=True).lanczos()
+
+        del g
+
     def test_power_iteration_bug(self):
         g = Graph()
         g[0, 0] = 0.0
@@ -751,6 +816,13 @@ class GraphTests(unittest.TestCase):
         self.assertEqual(indices.tolist(), [[2, 0], [0, 1], [1, 2]])
         self.assertEqual(weights.tolist(), [1.0, 1.0, 1.0])
 
+        g.update({})
+        g.update({(0, 1): 4.0, (2, 0): 5.0})
+        g.update([(1, 2, 6.0)])
+        indices, weights = g.edges()
+        self.assertEqual(indices.tolist(), [[2, 0], [0, 1], [1, 2]])
+        self.assertEqual(weights.tolist(), [5.0, 4.0, 6.0])
+
         g.del_edges(set())
         g.del_edges(set([tuple(i) for i in test_indices]))
         self.assertEqual(g.edges()[0].tolist(), [])
@@ -763,11 +835,7 @@ class GraphTests(unittest.TestCase):
         for i in range(1000):
             g.add_edge((i, i + 1), 1.0)
         indices, _ = g.edges(ret_weights=False)
-        indices = [tuple(x) for x in indices]
-        for i in range(1000):
-            self.assertIn((i, i + 1), indices)
-            indices.remove((i, i + 1))
-        self.assertEqual(len(indices), 0)
+        self.assertEqual(sorted(indices.tolist()), [[i, i + 1] for i in range(1000)])
         self.assertEqual(g.num_edges, 1000)
         self.assertEqual(len(g), 1000)
 
@@ -1030,6 +1098,23 @@ class GraphTests(unittest.TestCase):
         else:
             self.assertTrue(False)
 
+    def test_apply_delta(self):
+        g = Graph(directed=False)
+        g[0, 1] = 1.0
+        g[1, 2] = 2.0
+
+        g.apply_delta([])
+        g.apply_delta([(0, 1), (1, 2), (2, 3)], [-1.0, 1.0, 0.5])
+        self.assertEqual(g.as_dict(), {(1, 2): 3.0, (2, 3): 0.5})
+
+        g.apply_delta([(1, 2), (3, 2)], [-2.5, 1.0], eps=0.5)
+        self.assertEqual(g.as_dict(), {(2, 3): 1.5})
+
+        g.apply_delta([(2, 3)])
+        self.assertEqual(g.as_dict(), {(2, 3): 2.5})
+
+        del g
+
     def test_mul_vector(self):
         g = Graph(directed=True)
         for i in range(9):
@@ -1072,6 +1157,12 @@ class GraphTests(unittest.TestCase):
         indices, weights = d.entries()
         self.assertEqual(indices.tolist(), [0, 1, 2])
         self.assertEqual(weights.tolist(), [3.0, 3.0, 0.0])
+
+        in_degrees, in_weights, out_degrees, out_weights = g.degrees_weights()
+        self.assertEqual(in_degrees.as_dict(), g.in_degrees().as_dict())
+        self.assertEqual(in_weights.as_dict(), g.in_weights().as_dict())
+        self.assertEqual(out_degrees.as_dict(), g.out_degrees().as_dict())
+        self.assertEqual(out_weights.as_dict(), g.out_weights().as_dict())
         del g
 
     def test_anomalies(self):
@@ -1139,6 +1230,50 @@ class GraphTests(unittest.TestCase):
         del g
         del h
 
+    def test_get_nodes(self):
+        for directed in [False, True]:
+            g = Graph(directed=directed)
+            for i in range(1000):
+                g[i, i % 7] = 1.0
+
+            expected = {}
+            for (i, j) in g.keys():
+                expected[i] = expected.get(i, 0.0) + 1.0
+                expected[j] = expected.get(j, 0.0) + 1.0
+
+            self.assertEqual(g.nodes().as_dict(), expected)
+            self.assertEqual(g.num_nodes, 1000)
+            del g
+
+    def test_cache_revision(self):
+        g = Graph(directed=True)
+        self.assertTrue(g.empty())
+        self.assertEqual(g.num_edges, 0)
+        self.assertEqual(g.num_nodes, 0)
+
+        steps = [
+            (lambda: g.__setitem__((0, 1), 1.0),        {(0, 1): 1.0}),
+            (lambda: g.add_edge((0, 1), 1.0),           {(0, 1): 2.0}),
+            (lambda: g.add_edges([[1, 2]], [3.0]),      {(0, 1): 2.0, (1, 2): 3.0}),
+            (lambda: g.set_edges([[2, 3]], [1.0]),      {(0, 1): 2.0, (1, 2): 3.0, (2, 3): 1.0}),
+            (lambda: g.sub_edge((1, 2), 1.0),           {(0, 1): 2.0, (1, 2): 2.0, (2, 3): 1.0}),
+            (lambda: g.sub_edges([[0, 1]], [1.0]),      {(0, 1): 1.0, (1, 2): 2.0, (2, 3): 1.0}),
+            (lambda: g.mul_const(2.0),                  {(0, 1): 2.0, (1, 2): 4.0, (2, 3): 2.0}),
+            (lambda: g.__delitem__((2, 3)),             {(0, 1): 2.0, (1, 2): 4.0}),
+            (lambda: g.del_edges([[1, 2]]),             {(0, 1): 2.0}),
+            (lambda: g.clear(),                         {}),
+        ]
+
+        for mutate, expected in steps:
+            mutate()
+            self.assertEqual(g.as_dict(), expected)
+            self.assertEqual(g.empty(), len(expected) == 0)
+            self.assertEqual(g.num_edges, len(expected))
+            self.assertEqual(g.num_nodes, len(set(i for edge in expected for i in edge)))
+            self.assertEqual(g.sum_weights(), sum(expected.values()))
+
+        del g
+
     def test_normalize(self):
         g = Graph(directed=True)
         g[0, 1] = 1.0
@@ -1291,6 +1426,10 @@ class GraphTests(unittest.TestCase):
         result = g.top_edges(5, as_dict=True, truncate=True)
         self.assertEqual(result, {(2, 3): 99.0, (4, 6): 98.0, (6, 9): 97.0, (9, 2): 96.0, (1, 5): 95.0})
 
+        indices, weights = g.top_edges(1 << 40)
+        self.assertEqual(indices.shape, (100, 2))
+        self.assertEqual(weights[:3].tolist(), [99.0, 98.0, 97.0])
+
         del g
         g = Graph(directed=True)
 
@@ -1335,6 +1474,48 @@ class GraphTests(unittest.TestCase):
 
         del g
 
+    def test_edges_into(self):
+        g = Graph(directed=True)
+        g[0, 1] = 1.0
+        g[1, 2] = 2.0
+
+        indices = np.empty(shape=(3, 2), dtype=np.uint64)
+        weights = np.empty(shape=(3,), dtype=np.float32)
+        self.assertEqual(g.edges_into(indices, weights), 2)
+        self.assertEqual(sorted(indices[:2].tolist()), [[0, 1], [1, 2]])
+        self.assertEqual(sorted(weights[:2].tolist()), [1.0, 2.0])
+
+        self.assertEqual(g.edges_into(None, weights[:1]), 2)
+        self.assertEqual(g.edges_into(None, None), 2)
+
+        with self.assertRaises(ValueError):
+            g.edges_into(np.empty(shape=(3,), dtype=np.uint64), None)
+        with self.assertRaises(ValueError):
+            g.edges_into(None, np.empty(shape=(3,), dtype=np.float64))
+
+        del g
+
+    def test_edges_linear(self):
+        g = Graph(directed=True)
+        g[0, 1] = 1.0
+        g[1, 2] = 2.0
+        g[3, 0] = 3.0
+
+        keys, weights = g.edges_linear()
+        indices, weights2 = g.edges()
+        self.assertEqual(keys.tolist(), ((indices[:, 0] << 32) | indices[:, 1]).tolist())
+        self.assertEqual(weights.tolist(), weights2.tolist())
+
+        keys, weights = g.edges_linear(ret_weights=False)
+        self.assertEqual(sorted(keys.tolist()), [1, (1 << 32) | 2, 3 << 32])
+        self.assertEqual(weights, None)
+
+        g[1 << 32, 0] = 4.0
+        with self.assertRaises(ValueError):
+            g.edges_linear()
+
+        del g
+
     def test_duplicate(self):
         g = Graph(directed=True)
 
@@ -1938,17 +2119,17 @@ class TVGTests(unittest.TestCase):
         with self.assertRaises(MemoryError):
             tvg.sum_edges_exp_norm(1, 0, beta=beta)
 
-        expected = 0.0
-        for t, s in enumerate(source):
+        # Closed form of expected[t] = beta * expected[t - 1] + (1 - beta) * source[t].
+        lag = np.subtract.outer(np.arange(len(source)), np.arange(len(source)))
+        expected = np.tril((1.0 - beta) * beta ** np.maximum(lag, 0)).dot(source)
+
+        for t in range(len(source)):
             g = tvg.sum_edges_exp_norm(0, t, beta=beta)
-            expected = beta * expected + (1.0 - beta) * s
-            self.assertTrue(abs(g[0, 0] - expected) < 1e-6)
+            self.assertTrue(abs(g[0, 0] - expected[t]) < 1e-6)
 
-        expected = 0.0
-        for t, s in enumerate(source):
+        for t in range(len(source)):
             g = tvg.sum_edges_exp_norm(0, t, log_beta=math.log(beta))
-            expected = beta * expected + (1.0 - beta) * s
-            self.assertTrue(abs(g[0, 0] - expected) < 1e-6)
+            self.assertTrue(abs(g[0, 0] - expected[t]) < 1e-6)
 
         del tvg
 
@@ -2693,6 +2874,14 @@ class TVGTests(unittest.TestCase):
         self.assertTrue(abs(result[1, 1] - 0.25993019) < 1e-7)
         self.assertTrue(abs(result[2, 2] - 0.43152310) < 1e-7)
 
+        # More bins than values
+        result = metric_entropy_2d(values, num_bins=3)
+        self.assertEqual(len(result), 4)
+        self.assertTrue(abs(result[0, 0] - 0.69314718) < 1e-7)
+        self.assertTrue(abs(result[0, 1] - 0.51986039) < 1e-7)
+        self.assertTrue(abs(result[1, 1] - 0.51986039) < 1e-7)
+        self.assertTrue(abs(result[2, 2] - 0.69314718) < 1e-7)
+
     def test_metric_trend(self):
         tvg = TVG(positive=True)
 
@@ -2719,6 +2908,14 @@ class TVGTests(unittest.TestCase):
         self.assertTrue(abs(values[1] + 0.288675129) < 1e-7)
         self.assertTrue(abs(values[2] - 0.211324870) < 1e-7)
 
+        values = tvg.sample_eigenvectors(50, 350, sample_width=101, sample_steps=3, solver='lanczos')
+        values = metric_trend(values)
+
+        self.assertEqual(len(values), 3)
+        self.assertTrue(abs(values[0] + 0.288675129) < 1e-6)
+        self.assertTrue(abs(values[1] + 0.288675129) < 1e-6)
+        self.assertTrue(abs(values[2] - 0.211324870) < 1e-6)
+
         del tvg
 
     def test_metric_trend_edges(self):
@@ -2735,6 +2932,14 @@ class TVGTests(unittest.TestCase):
         self.assertTrue(abs(result[1, 1] + 1.0) < 1e-7)
         self.assertTrue(abs(result[2, 2] - 0.0) < 1e-7)
 
+        graphs = [Graph.from_dict(v, directed=True) for v in values]
+        result = metric_trend(graphs)
+        self.assertEqual(len(result), 4)
+        self.assertTrue(abs(result[0, 0] - 0.0) < 1e-7)
+        self.assertTrue(abs(result[0, 1] - 1.0) < 1e-7)
+        self.assertTrue(abs(result[1, 1] + 1.0) < 1e-7)
+        self.assertTrue(abs(result[2, 2] - 0.0) < 1e-7)
+
     def test_metric_stability_ratio_edges(self):
         values = [
             {(0, 0): 1.0, (0, 1): 0.0, (1, 1): 2.0, (2, 2): 2.0, (3, 3): 0.0},
@@ -3430,6 +3635,22 @@ class MongoDBTests(unittest.TestCase):
         self.assertTrue(isinstance(g, Graph))
         del g
 
+        future = mockupdb.go(Graph.load_many_from_mongodb, self.db,
+                             np.array([1337, 1338], dtype=np.uint64))
+
+        for doc in [1337, 1338]:
+            request = self.s.receives()
+            self.assertEqual(request["find"], "col_entities")
+            self.assertEqual(request["filter"], {'doc': doc})
+            self.assertEqual(request["sort"], {'sen': 1})
+            request.replies({'cursor': {'id': 0, 'firstBatch': []}})
+
+        graphs = future()
+        self.assertEqual(len(graphs), 2)
+        for g in graphs:
+            self.assertTrue(isinstance(g, Graph))
+        del graphs
+
     def test_max_distance(self):
         occurrences = [{'sen': 0, 'ent': 1 },
                        {'sen': 0x7fffffffffffffff, 'ent': 2 }]
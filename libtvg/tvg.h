@@ -18,7 +18,7 @@
 #include "list.h"
 #include "tree.h"
 
-#define LIBTVG_API_VERSION  0x00000009ULL
+#define LIBTVG_API_VERSION  0x0000000FULL
 
 #define TVG_FLAGS_RESERVED  0x00000001U  /* currently unused */
 #define TVG_FLAGS_POSITIVE  0x00000002U  /* weights are always positive */
@@ -80,6 +80,7 @@ struct vector
     uint64_t    refcount;
     uint32_t    flags;
     uint64_t    revision;
+    uint64_t    num_entries;
 
     /* private: */
     struct query *query;
@@ -1643,6 +1644,7 @@ int graph_has_edge(struct graph *graph, uint64_t source, uint64_t target);
 float graph_get_edge(struct graph *graph, uint64_t source, uint64_t target);
 uint64_t graph_num_edges(struct graph *graph);
 uint64_t graph_get_edges(struct graph *graph, uint64_t *indices, float *weights, uint64_t max_edges);
+uint64_t graph_get_edges_linear(struct graph *graph, uint64_t *keys, float *weights, uint64_t max_edges);
 struct vector *graph_get_nodes(struct graph *graph);
 uint64_t graph_get_top_edges(struct graph *graph, uint64_t *indices, float *weights, uint64_t max_edges);
 uint64_t graph_get_adjacent_edges(struct graph *graph, uint64_t source, uint64_t *indices, float *weights, uint64_t max_edges);
@@ -1661,6 +1663,7 @@ int graph_sub_graph(struct graph *out, struct graph *graph, float weight);
 int graph_del_edge(struct graph *graph, uint64_t source, uint64_t target);
 int graph_del_edges(struct graph *graph, uint64_t *indices, uint64_t num_edges);
 int graph_del_small(struct graph *graph, float eps);
+int graph_apply_delta(struct graph *graph, uint64_t *indices, float *weights, uint64_t num_edges, float eps);
 
 int graph_mul_const(struct graph *graph, float constant);
 struct vector *graph_mul_vector(const struct graph *graph, const struct vector *vector);
@@ -1671,6 +1674,9 @@ struct vector *graph_in_weights(const struct graph *graph);
 struct vector *graph_out_degrees(const struct graph *graph);
 struct vector *graph_out_weights(const struct graph *graph);
 
+int graph_degrees_weights(const struct graph *graph, struct vector **in_degrees, struct vector **in_weights,
+                          struct vector **out_degrees, struct vector **out_weights);
+
 struct vector *graph_degree_anomalies(const struct graph *graph);
 struct vector *graph_weight_anomalies(const struct graph *graph);
 
@@ -1688,6 +1694,8 @@ struct graph *graph_load_binary(const char *filename);
 
 int graph_bfs(struct graph *graph, uint64_t source, int use_weights, int (*callback)(struct graph *,
               const struct bfs_entry *, void *), void *userdata);
+uint64_t graph_bfs_collect(struct graph *graph, uint64_t source, int use_weights, uint64_t max_count,
+                           double max_weight, struct bfs_entry *entries, uint64_t max_entries);
 uint64_t graph_get_distance_count(struct graph *graph, uint64_t source, uint64_t end);
 double graph_get_distance_weight(struct graph *graph, uint64_t source, uint64_t end);
 struct vector *graph_get_all_distances_count(struct graph *graph, uint64_t source, uint64_t max_count);
@@ -1776,6 +1784,8 @@ struct mongodb *grab_mongodb(struct mongodb *mongodb);
 void free_mongodb(struct mongodb *mongodb);
 
 struct graph *mongodb_load_graph(struct tvg *tvg, struct mongodb *mongodb, struct objectid *objectid, uint32_t flags);
+uint64_t mongodb_load_graphs(struct tvg *tvg, struct mongodb *mongodb, struct objectid *objectids,
+                             uint64_t num_objectids, uint32_t flags, struct graph **graphs);
 int tvg_load_graphs_from_mongodb(struct tvg *tvg, struct mongodb *mongodb);
 
 #endif /* _TVG_H_ */
@@ -49,6 +49,7 @@ struct vector *alloc_vector(uint32_t flags)
     vector->refcount = 1;
     vector->flags    = flags;
     vector->revision = 0;
+    vector->num_entries = 0;
     vector->query    = NULL;
     vector->bits     = bits;
     vector->buckets  = buckets;
@@ -114,6 +115,7 @@ struct vector *vector_duplicate(struct vector *source)
     vector->refcount = 1;
     vector->flags    = source->flags;
     vector->revision = source->revision;
+    vector->num_entries = source->num_entries;
     vector->query    = NULL;
     vector->bits     = source->bits;
     vector->buckets  = buckets;
@@ -224,14 +226,11 @@ int vector_dec_bits(struct vector *vector)
 
 void vector_optimize(struct vector *vector)
 {
-    uint64_t i, num_buckets;
+    uint64_t num_buckets;
     uint64_t num_entries;
 
     num_buckets = 1ULL << vector->bits;
-
-    num_entries = 0;
-    for (i = 0; i < num_buckets; i++)
-        num_entries += bucket1_num_entries(&vector->buckets[i]);
+    num_entries = vector->num_entries;
 
     if (num_entries >= num_buckets * 256)
     {
@@ -262,28 +261,12 @@ error:
 
 int vector_empty(struct vector *vector)
 {
-    struct entry1 *entry;
-
-    VECTOR_FOR_EACH_ENTRY(vector, entry)
-    {
-        return 0;
-    }
-
-    return 1;
+    return !vector->num_entries;
 }
 
 uint64_t vector_num_entries(struct vector *vector)
 {
-    uint64_t i, num_buckets;
-    uint64_t num_entries;
-
-    num_buckets = 1ULL << vector->bits;
-
-    num_entries = 0;
-    for (i = 0; i < num_buckets; i++)
-        num_entries += bucket1_num_entries(&vector->buckets[i]);
-
-    return num_entries;
+    return vector->num_entries;
 }
 
 uint64_t vector_get_entries(struct vector *vector, uint64_t *indices, float *weights, uint64_t max_entries)
@@ -293,7 +276,7 @@ uint64_t vector_get_entries(struct vector *vector, uint64_t *indices, float *wei
 
     VECTOR_FOR_EACH_ENTRY(vector, entry)
     {
-        if (count++ >= max_entries) continue;
+        if (count++ >= max_entries) return vector->num_entries;
         if (indices)
         {
             *indices++ = entry->index;
@@ -591,6 +574,7 @@ struct vector *vector_load_binary(const char *filename)
         if (fread(bucket->entries, sizeof(*bucket->entries), num_entries, fp) != num_entries)
             goto error;
         bucket->num_entries = num_entries;
+        result->num_entries += num_entries;
     }
 
     /* Loading successful. */
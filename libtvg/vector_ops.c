@@ -16,7 +16,17 @@ static inline struct bucket1 *_vector_get_bucket(struct vector *vector, uint64_t
 static inline struct entry1 *_vector_get_entry(struct vector *vector, uint64_t index, int allocate)
 {
     struct bucket1 *bucket = _vector_get_bucket(vector, index);
-    return bucket1_get_entry(bucket, index, allocate);
+    uint64_t num_entries;
+    struct entry1 *entry;
+
+    if (!allocate)
+        return bucket1_get_entry(bucket, index, 0);
+
+    num_entries = bucket->num_entries;
+    entry = bucket1_get_entry(bucket, index, 1);
+    if (bucket->num_entries != num_entries)
+        vector->num_entries++;
+    return entry;
 }
 
 int vector_has_entry(struct vector *vector, uint64_t index)
@@ -45,6 +55,7 @@ int vector_clear(struct vector *vector)
     for (i = 0; i < num_buckets; i++)
         bucket1_clear(&vector->buckets[i]);
 
+    vector->num_entries = 0;
     vector->revision++;
     if (!--vector->optimize)
         vector_optimize(vector);
@@ -104,6 +115,7 @@ int vector_del_entry(struct vector *vector, uint64_t index)
 
     bucket1_del_entry(bucket, entry);
 
+    vector->num_entries--;
     vector->revision++;
     if (!--vector->optimize)
         vector_optimize(vector);
@@ -141,6 +153,7 @@ int vector_del_small(struct vector *vector, float eps)
 
     eps = fabs(eps);  /* ensure eps is positive */
     num_buckets = 1ULL << vector->bits;
+    vector->num_entries = 0;
     for (i = 0; i < num_buckets; i++)
     {
         bucket = &vector->buckets[i];
@@ -167,6 +180,7 @@ int vector_del_small(struct vector *vector, float eps)
 
         bucket->num_entries = (uint64_t)(out - &bucket->entries[0]);
         assert(bucket->num_entries <= bucket->max_entries);
+        vector->num_entries += bucket->num_entries;
     }
 
     vector->revision++;